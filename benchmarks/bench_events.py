@@ -0,0 +1,84 @@
+""" Memory and time per Event and MiniPrixEvent.
+
+    Run from the repository root:
+    python benchmarks/bench_events.py
+"""
+# Python imports
+from datetime import datetime, timedelta, timezone
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py"))
+
+# Local import
+from pengbot99 import events
+
+
+# A day of 1-minute Mini-Prix rows
+COUNT = 24 * 60
+START = datetime(2025, 5, 5, tzinfo=timezone.utc)
+
+
+def create_events():
+    evts = []
+    for idx in range(COUNT):
+        evts.append(events.Event(
+                "knight", cycle=idx, start_minute=0, end_minute=10,
+                rotation=("knight", "queen"), rotation_offset=idx % 2, schedname="weekday",
+                start_time=START + timedelta(minutes=idx),
+            ))
+    return evts
+
+
+def create_miniprix_events():
+    evts = []
+    for idx in range(COUNT):
+        evt = events.MiniPrixEvent(
+                "miniprix", "{:03d}.{:d}".format(idx % 40, idx % 9),
+                "Big_Blue", "Death_Wind_I", "White_Land_I",
+                start_minute=idx, end_minute=idx + 1, mirrored="010", schedname="miniprix",
+                start_time=START + timedelta(minutes=idx),
+            )
+        evts.append(evt)
+    return evts
+
+
+def read_names(evts):
+    for evt in evts:
+        evt.name
+        evt.race1
+        evt.race2
+        evt.race3
+
+
+def measure_memory(create_fn):
+    """ Bytes allocated per event, start times included.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    evts = create_fn()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # the list holding the events is not counted
+    return (after - before - sys.getsizeof(evts)) / len(evts)
+
+
+def measure_time(stmt, number=20):
+    """ Microseconds per event.
+    """
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number / COUNT * 1e6
+
+
+def main():
+    mp_evts = create_miniprix_events()
+    print("Event:         {0:7.1f} bytes, {1:5.2f} us to create".format(
+            measure_memory(create_events), measure_time(create_events)))
+    print("MiniPrixEvent: {0:7.1f} bytes, {1:5.2f} us to create, {2:5.2f} us to read names".format(
+            measure_memory(create_miniprix_events), measure_time(create_miniprix_events),
+            measure_time(lambda: read_names(mp_evts))))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 # Python imports
 from datetime import datetime, timedelta, timezone
 
+import asyncio
+import heapq
+import itertools
+
 
 # 3rd party imports
 import discord
@@ -12,9 +16,14 @@ from pengbot99 import apiadapter
 from pengbot99 import choicerace
 from pengbot99 import explain_cmd
 from pengbot99 import formatters
+from pengbot99 import manager_registry
 from pengbot99 import miniprix
+from pengbot99 import response_cache
 from pengbot99 import schedule
+from pengbot99 import schedule_cache
 from pengbot99 import secret_league
+from pengbot99 import single_flight
+from pengbot99 import timeline_file
 from pengbot99 import ui
 from pengbot99 import utils
 
@@ -23,100 +32,269 @@ from pengbot99 import utils
 # Load schedule constants from a env-defined versioned config file
 env, csts, xpln = utils.load_config()
 
+# Schedule managers used by most commands and by the schedule board,
+# built in the background once the bot is connected.
+HOT_MANAGERS = ["slot1", "slot2", "miniprix", "ninetynine"]
+# Worker threads for schedule queries, unless SCHEDULE_WORKERS is set.
+SCHEDULE_WORKERS = 4
+# Seconds a command waits for its query before deferring the response,
+# well within the 3 seconds Discord allows before the first reply.
+DEFER_AFTER = 1.0
+# Seconds past an event boundary before the board is refreshed, so that
+# the new event is on by then.
+BOARD_REFRESH_DELAY = 1
+
 class Pengbot(object):
+    """ Holds all schedule managers. Each manager is built the first time
+        it is used, see HOT_MANAGERS to build some of them ahead.
+    """
     def __init__(self, env, csts):
         self.env = env
         self.csts = csts
-
-        # all env values are str, convert schedule offsets to int now
-        mp_offset = int(csts["MINIPRIX_LINE_UP_OFFSET"])
-        cmp_offset = int(csts["CLASSIC_LINE_UP_OFFSET"])
-        mirror_offset = int(csts["MIRROR_LINE_UP_OFFSET"])
+        # set if timelines are shared with other processes
+        self.timeline_file = None
+        # parsed schedules and derived values from previous runs
+        self._cache = schedule_cache.ScheduleCache(env['CONFIG_PATH'], env.get("SCHEDULE_CACHE"))
+        # schedules loaded in this run, some are used by several managers
+        self._schedules = {}
 
         # Glitch GP
-        secret_cfg = None
-        we_secret_cfg = None
+        self._secret_cfg = None
+        self._we_secret_cfg = None
         if csts.get("SECRET_LEAGUE_INTERVALS"):
-            secret_cfg = secret_league.SecretLeagueConfig(
+            self._secret_cfg = secret_league.SecretLeagueConfig(
                     csts["SECRET_LEAGUE_INTERVALS"],
                     csts.get("SECRET_LEAGUE_OFFSET"),
                 )
-            utils.log("Secret League initialized with {0}".format(secret_cfg.indices))
+            utils.log("Secret League initialized with {0}".format(self._secret_cfg.indices))
         if csts.get("SECRET_LEAGUE_INTERVALS") and csts.get("WEEKEND_SECRET_LEAGUE_INTERVALS"):
-            we_secret_cfg = secret_league.SecretLeagueConfig(
+            self._we_secret_cfg = secret_league.SecretLeagueConfig(
                     csts["WEEKEND_SECRET_LEAGUE_INTERVALS"],
                     csts.get("WEEKEND_SECRET_LEAGUE_OFFSET"),
                 )
-            utils.log("Weekend Secret League is ON: {0}".format(we_secret_cfg.indices))
-
-        # load the schedule for slot 1 (99 races)
-        r99sched = schedule.load_schedule(env['CONFIG_PATH'], 'slot1_schedule')
-        # load the weekday schedule for slot 2 (Prix and special events)
-        wdsched = schedule.load_schedule(env['CONFIG_PATH'], 'slot2_schedule')
-        # load the weekend schedule for slot 2 (Prix and special events)
-        wesched = schedule.load_schedule(env['CONFIG_PATH'], 'slot2_schedule_weekend')
-        # load the Classic Mini Prix track schedule
-        cmpsched = schedule.load_schedule(env['CONFIG_PATH'], 'classic_mp_schedule')
-        # load the Mini Prix track schedule
-        mpsched = schedule.load_schedule(env['CONFIG_PATH'], 'miniprix_schedule')
-        mirrorsc = schedule.load_schedule(env['CONFIG_PATH'], 'miniprix_mirroring_schedule')
-        # load the schedule for Private Lobbies Mini-Prix
-        plmpsched = schedule.load_schedule(env["CONFIG_PATH"], "private_miniprix_schedule")
-        plcmpsched = schedule.load_schedule(env["CONFIG_PATH"], "private_classic_mp_schedule")
-
-        # Create the Public schedule managers
-        r99_offset = int(csts["NINETYNINE_MINUTE_OFFSET"])
-
-        self.slot1mgr = schedule.Slot1ScheduleManager(schedule.glitch_origin, r99sched)
-        self.slot2mgr = schedule.Slot2ScheduleManager(
-                origin=schedule.origin, weekday_sched=wdsched, weekend_sched=wesched,
-                secret_cfg=secret_cfg, we_secret_cfg=we_secret_cfg)
-        self.cmp_mgr = miniprix.MiniPrixManager("classicprix", self.slot2mgr, cmpsched, offset=cmp_offset)
-        self.mp_mgr = miniprix.MiniPrixManager("miniprix", self.slot2mgr, mpsched, mirrorsc,
-                mp_offset, mirror_offset)
-        utils.log("Setting cycles to {0} for {1}.".format(self.mp_mgr.mp_cycles, self.mp_mgr.name))
-        self.r99_mgr = choicerace.init_99_manager(name=None, glitch_mgr=self.slot1mgr, env=env,
-                minutes_offset=r99_offset)
-
-        # Create Private Lobby schedule managers
-        pmp_origin = schedule.origin + timedelta(minutes=int(csts["PRIVATE_MP_MINUTE_OFFSET"]))
-        pmp_mirror_origin = schedule.origin + timedelta(minutes=int(csts["PRIVATE_MP_MIRROR_MINUTE_OFFSET"]))
-        pcmp_origin = schedule.origin + timedelta(minutes=int(csts["PRIVATE_CMP_MINUTE_OFFSET"]))
-
-        pl_slot1 = schedule.Slot1ScheduleManager(pmp_origin, plmpsched)
-        mirror_slot1 = schedule.Slot1ScheduleManager(pmp_mirror_origin, mirrorsc)
-        self.pmp_mgr = miniprix.PrivateMPManager("miniprix", pl_slot1, self.mp_mgr, mirror_slot1)
-        plcmp_slot1 = schedule.Slot1ScheduleManager(pcmp_origin, plcmpsched)
-        self.pcmp_mgr = miniprix.PrivateMPManager("classicprix", plcmp_slot1, self.cmp_mgr)
-
-        # Shuffle Mini-Prix schedule managers
-        self.smp_mgr = None
-        self.psmp_mgr = None
-
-        smp_offset = csts.get("SHUFFLE_MINIPRIX_LINE_UP_OFFSET")
-        if smp_offset is None:
-            # Shuffle is currently off
-            return
-        smp_offset = int(smp_offset)
-        smp_mirror_offset = int(csts.get("SHUFFLE_MIRROR_LINE_UP_OFFSET", mirror_offset))
-        self.smp_mgr = miniprix.MiniPrixManager("miniprix", self.slot2mgr, mpsched, mirrorsc,
-                smp_offset, smp_mirror_offset)
-        psmp_origin = schedule.origin + timedelta(minutes=int(csts["PRIVATE_SHUFFLE_MP_MINUTE_OFFSET"]))
-        psl_slot1 = schedule.Slot1ScheduleManager(psmp_origin, plmpsched)
-        self.psmp_mgr = miniprix.PrivateMPManager("miniprix", psl_slot1, self.smp_mgr, None)
-        utils.log("!! Configured Shuffle Weekend !!")
+            utils.log("Weekend Secret League is ON: {0}".format(self._we_secret_cfg.indices))
+
+        self.registry = manager_registry.ManagerRegistry()
+        self.registry.register("slot1", self._build_slot1)
+        self.registry.register("slot2", self._build_slot2)
+        self.registry.register("classicprix", self._build_classicprix)
+        self.registry.register("miniprix", self._build_miniprix)
+        self.registry.register("ninetynine", self._build_ninetynine)
+        self.registry.register("private_miniprix", self._build_private_miniprix)
+        self.registry.register("private_classicprix", self._build_private_classicprix)
+        self._shuffle = csts.get("SHUFFLE_MINIPRIX_LINE_UP_OFFSET") is not None
+        if self._shuffle:
+            self.registry.register("shuffle_miniprix", self._build_shuffle_miniprix)
+            self.registry.register("private_shuffle_miniprix", self._build_private_shuffle_miniprix)
+            utils.log("!! Configured Shuffle Weekend !!")
+        # managers may parse schedules or compute Mini-Prix durations
+        self.registry.add_build_callback(lambda name: self._cache.save())
+
+    def _load_schedule(self, name):
+        if name not in self._schedules:
+            self._schedules[name] = self._cache.load_schedule(name)
+        return self._schedules[name]
+
+    def _get_origin(self, cst_name):
+        return schedule.origin + timedelta(minutes=int(self.csts[cst_name]))
+
+    def _get_mp_cycles(self, event_name):
+        # Mini-Prix durations only depend on the slot 2 schedules
+        slot2_names = ["slot2_schedule", "slot2_schedule_weekend"]
+        return self._cache.get_value("{0}.mp_cycles".format(event_name), slot2_names,
+                lambda: miniprix.find_mp_cycles(self.slot2mgr, event_name))
+
+    def _log_timeline_size(self, mgr_name, mgr):
+        msg = "Timeline for {0} will use {1} bytes."
+        utils.log(msg.format(mgr_name, mgr.get_timeline_size()))
+
+    def _build_slot1(self):
+        # the schedule for slot 1 (99 races)
+        mgr = schedule.Slot1ScheduleManager(schedule.glitch_origin, self._load_schedule("slot1_schedule"))
+        self._log_timeline_size("slot 1", mgr)
+        return mgr
+
+    def _build_slot2(self):
+        # the weekday and weekend schedules for slot 2 (Prix and special events)
+        mgr = schedule.Slot2ScheduleManager(
+                origin=schedule.origin,
+                weekday_sched=self._load_schedule("slot2_schedule"),
+                weekend_sched=self._load_schedule("slot2_schedule_weekend"),
+                secret_cfg=self._secret_cfg, we_secret_cfg=self._we_secret_cfg)
+        self._log_timeline_size("slot 2", mgr)
+        return mgr
+
+    def _build_classicprix(self):
+        # all env values are str, convert schedule offsets to int now
+        cmp_offset = int(self.csts["CLASSIC_LINE_UP_OFFSET"])
+        return miniprix.MiniPrixManager("classicprix", self.slot2mgr,
+                self._load_schedule("classic_mp_schedule"), offset=cmp_offset,
+                mp_cycles=self._get_mp_cycles("classicprix"))
+
+    def _build_miniprix(self):
+        mp_offset = int(self.csts["MINIPRIX_LINE_UP_OFFSET"])
+        mirror_offset = int(self.csts["MIRROR_LINE_UP_OFFSET"])
+        mgr = miniprix.MiniPrixManager("miniprix", self.slot2mgr,
+                self._load_schedule("miniprix_schedule"),
+                self._load_schedule("miniprix_mirroring_schedule"),
+                mp_offset, mirror_offset, mp_cycles=self._get_mp_cycles("miniprix"))
+        utils.log("Setting cycles to {0} for {1}.".format(mgr.mp_cycles, mgr.name))
+        return mgr
+
+    def _build_ninetynine(self):
+        r99_offset = int(self.csts["NINETYNINE_MINUTE_OFFSET"])
+        return choicerace.init_99_manager(name=None, glitch_mgr=self.slot1mgr, env=self.env,
+                minutes_offset=r99_offset, nnsched=self._load_schedule("ninetynine_schedule"))
+
+    def _build_private_miniprix(self):
+        pl_slot1 = schedule.Slot1ScheduleManager(self._get_origin("PRIVATE_MP_MINUTE_OFFSET"),
+                self._load_schedule("private_miniprix_schedule"))
+        mirror_slot1 = schedule.Slot1ScheduleManager(self._get_origin("PRIVATE_MP_MIRROR_MINUTE_OFFSET"),
+                self._load_schedule("miniprix_mirroring_schedule"))
+        return miniprix.PrivateMPManager("miniprix", pl_slot1, self.mp_mgr, mirror_slot1)
+
+    def _build_private_classicprix(self):
+        plcmp_slot1 = schedule.Slot1ScheduleManager(self._get_origin("PRIVATE_CMP_MINUTE_OFFSET"),
+                self._load_schedule("private_classic_mp_schedule"))
+        return miniprix.PrivateMPManager("classicprix", plcmp_slot1, self.cmp_mgr)
+
+    def _build_shuffle_miniprix(self):
+        smp_offset = int(self.csts["SHUFFLE_MINIPRIX_LINE_UP_OFFSET"])
+        smp_mirror_offset = int(self.csts.get("SHUFFLE_MIRROR_LINE_UP_OFFSET",
+                self.csts["MIRROR_LINE_UP_OFFSET"]))
+        return miniprix.MiniPrixManager("miniprix", self.slot2mgr,
+                self._load_schedule("miniprix_schedule"),
+                self._load_schedule("miniprix_mirroring_schedule"),
+                smp_offset, smp_mirror_offset, mp_cycles=self._get_mp_cycles("miniprix"))
+
+    def _build_private_shuffle_miniprix(self):
+        psl_slot1 = schedule.Slot1ScheduleManager(self._get_origin("PRIVATE_SHUFFLE_MP_MINUTE_OFFSET"),
+                self._load_schedule("private_miniprix_schedule"))
+        return miniprix.PrivateMPManager("miniprix", psl_slot1, self.smp_mgr, None)
+
+    @property
+    def slot1mgr(self):
+        return self.registry.get("slot1")
+
+    @property
+    def slot2mgr(self):
+        return self.registry.get("slot2")
+
+    @property
+    def cmp_mgr(self):
+        return self.registry.get("classicprix")
+
+    @property
+    def mp_mgr(self):
+        return self.registry.get("miniprix")
+
+    @property
+    def r99_mgr(self):
+        return self.registry.get("ninetynine")
+
+    @property
+    def pmp_mgr(self):
+        return self.registry.get("private_miniprix")
+
+    @property
+    def pcmp_mgr(self):
+        return self.registry.get("private_classicprix")
+
+    @property
+    def smp_mgr(self):
+        if not self._shuffle:
+            return None
+        return self.registry.get("shuffle_miniprix")
+
+    @property
+    def psmp_mgr(self):
+        if not self._shuffle:
+            return None
+        return self.registry.get("private_shuffle_miniprix")
 
     def is_shuffle_on(self):
-        if self.smp_mgr:
-            return True
-        return False
+        return self._shuffle
+
+    def warm_up(self):
+        """ Builds the managers listed in WARM_UP_MANAGERS, or HOT_MANAGERS.
+            If TIMELINE_PATH is set, every manager's timeline is then
+            shared, otherwise it is built, which builds the remaining
+            managers too. Nothing more is built if WARM_UP_MANAGERS is empty.
+        """
+        names = self.env.get("WARM_UP_MANAGERS")
+        if names is None:
+            names = HOT_MANAGERS
+        else:
+            names = [name.strip() for name in names.split(",") if name.strip()]
+        self.registry.warm_up(names)
+        if not names:
+            return
+        # warm_up runs again each time the bot reconnects
+        if self.env.get("TIMELINE_PATH"):
+            if self.timeline_file is None:
+                self.share_timelines(self.env["TIMELINE_PATH"])
+        else:
+            self.build_timelines()
+
+    def get_schedule_managers(self):
+        """ Every schedule manager by name. Public Mini-Prix managers run
+            on slot 2 and private lobby managers have their own.
+        """
+        mgrs = {
+                "slot1": self.slot1mgr,
+                "slot2": self.slot2mgr,
+                "ninetynine": self.r99_mgr.mgr,
+                "private_miniprix": self.pmp_mgr.mgr,
+                "private_miniprix_mirror": self.pmp_mgr.mirror_mgr,
+                "private_classicprix": self.pcmp_mgr.mgr,
+            }
+        if self.is_shuffle_on():
+            mgrs["private_shuffle_miniprix"] = self.psmp_mgr.mgr
+        return mgrs
+
+    def build_timelines(self):
+        """ Builds the timeline of every schedule manager ahead of the first
+            query needing it, which takes seconds without numpy.
+        """
+        timer = utils.PhaseTimer()
+        for name, mgr in self.get_schedule_managers().items():
+            mgr.get_timeline()
+            timer.mark(name)
+        timer.log("Built timelines")
+
+    def share_timelines(self, folder):
+        """ Maps the timelines of all schedule managers from a file shared
+            with other processes using the same config.
+        """
+        start = datetime.now()
+        key = timeline_file.config_key(self.env['CONFIG_PATH'])
+        self.timeline_file = timeline_file.share_timelines(folder, key, self.get_schedule_managers())
+        elapsed = (datetime.now() - start).total_seconds()
+        utils.log("Mapped timelines from {0} in {1:.2f}s.".format(self.timeline_file.path, elapsed))
 
 
 # Using the Pengbot class as a holder for all schedule managers for now.
 pb = Pengbot(env, csts)
 bot = discord.Bot()
 
-explainer = explain_cmd.Explainer(xpln, pb.slot2mgr)
+explainer = explain_cmd.Explainer(xpln, lambda: pb.slot2mgr)
+# rendered responses, shared by commands and the schedule board
+responses = response_cache.ResponseCache()
+# schedule queries, run off the event loop, identical concurrent ones run once
+flights = single_flight.SingleFlight(max_workers=int(env.get("SCHEDULE_WORKERS") or SCHEDULE_WORKERS))
+
+
+async def _run_query(ctx, kind, args, compute_fn):
+    """ Returns the result of a schedule query run on the worker threads.
+        If it is not ready within DEFER_AFTER seconds, the response is
+        deferred so that the interaction does not time out meanwhile.
+    """
+    query = asyncio.ensure_future(flights.run(kind, args, compute_fn))
+    done, pending = await asyncio.wait([query], timeout=DEFER_AFTER)
+    if pending:
+        utils.log("Deferring {0}, {1} query still running.".format(ctx.command, kind))
+        await ctx.defer()
+    return await query
 
 
 def _validate_utc_time(str_time):
@@ -142,10 +320,16 @@ async def get_mp_types(ctx: discord.AutocompleteContext):
     return list(ui.mp_event_choices.keys())
 
 
+async def get_findtrack_types(ctx: discord.AutocompleteContext):
+    """ 
+    """
+    return list(ui.findtrack_event_choices.keys())
+
+
 async def get_tracks(ctx: discord.AutocompleteContext):
     """ 
     """
-    if ctx.options.get("event_type") == "Classic Mini-Prix":
+    if ctx.options.get("event_type") in ("Classic Mini-Prix", "Private Classic Mini-Prix"):
         return list(ui.cmp_track_choices.keys())
     else:
         return list(ui.mp_track_choices.keys())
@@ -174,10 +358,15 @@ async def create_schedule_messages():
     return msg_env
 
 
+# the schedule board refresh task, started once the bot is online
+board_refresh = None
+
+
 async def configure_schedule_edit(interval=10):
     """
-    interval: how many minutes between refreshes
+    interval: the most minutes between refreshes
     """
+    global board_refresh
     msg_env = utils.read_msg_struct()
     if not msg_env:
         utils.log("Creating message structure...")
@@ -189,21 +378,10 @@ async def configure_schedule_edit(interval=10):
         for mp_type in ("miniprix", "classicprix"):
             await _edit_miniprix_message(mp_type)
 
-    # local time for the bot
-    now = datetime.now(timezone.utc)
-    # round minutes to the last interval occurence (e.g. tens)
-    minute = now.minute // interval * interval
-    # add interval minutes delta
-    delta = timedelta(minutes=interval)
-    kickoff_time = datetime(now.year, now.month, now.day, now.hour, minute, tzinfo=timezone.utc) + delta
-
-    @tasks.loop(time=kickoff_time.time(), count=1)
-    async def start_schedule_edit():
-        utils.log("Starting the schedule editing loop!")
-        edit_schedule_message.start()
-
-    utils.log("Schedule edit will start at {0}.".format(kickoff_time.strftime("%H:%M")))
-    start_schedule_edit.start()
+    # on_ready runs again after reconnecting
+    if board_refresh is None or board_refresh.done():
+        utils.log("Starting the schedule board refresh!")
+        board_refresh = asyncio.ensure_future(refresh_schedule_board(timedelta(minutes=interval)))
 
 
 @bot.event
@@ -219,6 +397,8 @@ async def on_ready():
         await apiadapter.update_activity(bot, ticker)
     # Kick-off the automatic announce
     #announce_schedule.start()
+    # build the managers most commands need without blocking the event loop
+    await asyncio.to_thread(pb.warm_up)
 
 
 # command option help tips
@@ -240,67 +420,87 @@ async def showevents(
     if err:
         await ctx.respond(err)
         return None
-    evts = pb.slot2mgr.list_events(timestamp=from_time, next=80)
-    if not evts:
+    response = await _run_query(ctx, "showevents", (from_time,), lambda: _showevents(from_time))
+    if not response:
         await ctx.respond("Could not fetch any event :(")
         return None
+    await ctx.respond(response)
+
+
+def _showevents(from_time=None):
+    now = datetime.now(timezone.utc)
+    return responses.get("showevents", (from_time,),
+            lambda: _compute_showevents(from_time, now), now)
+
+
+def _compute_showevents(from_time, now):
+    evts = pb.slot2mgr.list_events(timestamp=from_time or now, next=80)
+    if not evts:
+        return None, None
+    boundary = None
     if from_time:
         header = "F-Zero 99 events {0} local time:"
         response = [header.format(formatters.format_discord_timestamp(from_time, inline=True))]
+        times = [from_time]
     else:
+        boundary = response_cache.get_list_boundary(evts, 80)
         response = ["F-Zero 99 Upcoming events in your local time:"]
         ongoing_evt = evts[0].name
         ongoing_evt_end = evts[0].end_time
         response.append(formatters.format_current_event(ongoing_evt, ongoing_evt_end))
         evts = evts[1:]
+        times = []
     for evt in evts:
         response.append(formatters.format_future_event(evt))
-    await ctx.respond('\n'.join(response))
+    times.extend(evt.start_time for evt in evts)
+    return '\n'.join(response), response_cache.get_expiry(boundary, times, now)
 
 
 def _when_secret_league(mgr, count, from_time):
     if not mgr.is_secret_league_on():
         return None
-    # let's look for all Grand Prix first.
-    names = ui.event_choices.get("Grand Prix")
-    # We need to query enough GPs for the secret league pattern to generate matches
-    # This might result in more results than we need so we will trim later.
-    gp_count = ((count // mgr._secret_cfg.interval_count) + 1) * mgr._secret_cfg.length
-    gp_evts = mgr.when_event(names=names, count=gp_count, timestamp=from_time)
-    # only keep glitch GPs
-    evts = [evt for evt in gp_evts if evt.glitch]
-    if len(evts) > count:
-        return evts[:count]
-    return evts
+    return mgr.when_secret_league(count=count, timestamp=from_time)
 
 
 def _when(event_type, from_time=None, count=5):
+    now = datetime.now(timezone.utc)
+    return responses.get("when", (event_type, from_time, count),
+            lambda: _compute_when(event_type, from_time, count, now), now)
+
+
+def _compute_when(event_type, from_time, count, now):
     names = ui.event_choices.get(event_type)
+    timestamp = from_time or now
     evts = None
     if event_type == "Glitch 99":
         mgr = pb.slot1mgr
-        evts = mgr.when_event(names=names, count=count, timestamp=from_time)
+        evts = mgr.when_event(names=names, count=count, timestamp=timestamp)
         fmt_func = formatters.format_glitch_event
     elif event_type == "Secret League":
         mgr = pb.slot2mgr
-        evts = _when_secret_league(mgr, count, from_time)
+        evts = _when_secret_league(mgr, count, timestamp)
         fmt_func = formatters.format_future_event
     else:
         mgr = pb.slot2mgr
-        evts = mgr.when_event(names=names, count=count, timestamp=from_time)
+        evts = mgr.when_event(names=names, count=count, timestamp=timestamp)
         fmt_func = formatters.format_future_event
     if not evts:
         utils.log("Could not fetch any '{0}' event :(".format(event_type))
-        return None
+        return None, None
+    times = [evt.start_time for evt in evts]
+    # the next event drops from the list once it starts
+    boundary = evts[0].start_time
     if from_time:
         header = "{0} events {1} local time:"
         time_str = formatters.format_discord_timestamp(from_time, inline=True)
         response = [header.format(event_type, time_str)]
+        times.append(from_time)
+        boundary = None
     else:
         response = ["Next {0} events in your local time:".format(event_type)]
     for evt in evts:
         response.append(fmt_func(evt))
-    return '\n'.join(response)
+    return '\n'.join(response), response_cache.get_expiry(boundary, times, now)
 
 
 @bot.slash_command(name="when", description="List time for specific events")
@@ -313,7 +513,8 @@ async def when(
     if not 0 < count <= MAX_COUNT_VALUE:
         response = "Disqualified! Invalid 'count' value {0}. Must be between 1 and 12.".format(count)
     else:
-        response = _when(event_type, count=count)
+        response = await _run_query(ctx, "when", (event_type, None, count),
+                lambda: _when(event_type, count=count))
     if response:
         await ctx.respond(response)
     else:
@@ -334,7 +535,8 @@ async def utc_when(
     else:
         err, from_time = _validate_utc_time(from_time)
     if not err:
-        response = _when(event_type, from_time, count)
+        response = await _run_query(ctx, "when", (event_type, from_time, count),
+                lambda: _when(event_type, from_time, count))
         if not response:
             err = "POWER DOWN! No result for '{0}' :(".format(event_type)
     await ctx.respond(err or response)
@@ -358,15 +560,18 @@ def _fetch_miniprix_events(event_type, from_time, private):
             mgr = pb.pmp_mgr
         else:
             mgr = pb.mp_mgr
-    evts = mgr.get_miniprix(timestamp=from_time)
-    if evts and event_type != "classicprix" and pb.is_shuffle_on():
-        if not pb.slot2mgr.is_weekday(evts[0].start_time):
-            if private:
-                mgr = pb.psmp_mgr
-            else:
-                mgr = pb.smp_mgr
-            evts = mgr.get_miniprix(timestamp=from_time)
-    return evts
+    if event_type == "classicprix" or not pb.is_shuffle_on():
+        return mgr.get_miniprix(timestamp=from_time)
+    # pick the Machine Shuffle managers on weekends, before looking up lineups
+    if private:
+        # private lobby lineups start at from_time
+        if not pb.slot2mgr.is_weekday(from_time):
+            mgr = pb.psmp_mgr
+        return mgr.get_miniprix(timestamp=from_time)
+    window = pb.slot2mgr.resolve_window(event_type, from_time)
+    if window and not pb.slot2mgr.is_weekday(window[0].start_time):
+        mgr = pb.smp_mgr
+    return mgr.get_miniprix(timestamp=from_time, window=window)
 
 
 def _build_mp_event_name(event_type, private, start_time):
@@ -386,33 +591,49 @@ def _create_miniprix_message(event_type, track_filter, utc_time, verbose, privat
     err, from_time = _validate_utc_time(utc_time)
 
     if not err:
-        if event_type == "classicprix":
-            track = ui.cmp_track_choices.get(track_filter)
-        else:
-            track = ui.mp_track_choices.get(track_filter)
-
-        evts = _fetch_miniprix_events(event_type, from_time, private)
-        if evts:
-            evt_name = _build_mp_event_name(event_type, private, evts[0].start_time)
-            start = int(evts[0].start_time.timestamp())
-            header = "Track selection for {0} scheduled <t:{1}:R>".format(evt_name, start)
-            response = [header]
-            for evt in evts:
-                if not track_filter or evt.has_track(track):
-                    response.append(formatters.format_track_selection(evt, verbose))
-            if len(response) == 1:
-                response.append("No results :(")
-            response = '\n'.join(response)
+        now = datetime.now(timezone.utc)
+        args = (event_type, track_filter, from_time, verbose, private)
+        response = responses.get("miniprix", args,
+                lambda: _compute_miniprix_message(*args, now), now)
     return err, response
 
 
+def _compute_miniprix_message(event_type, track_filter, from_time, verbose, private, now):
+    if event_type == "classicprix":
+        track = ui.cmp_track_choices.get(track_filter)
+    else:
+        track = ui.mp_track_choices.get(track_filter)
+
+    evts = _fetch_miniprix_events(event_type, from_time, private)
+    if not evts:
+        return None, None
+    evt_name = _build_mp_event_name(event_type, private, evts[0].start_time)
+    start = int(evts[0].start_time.timestamp())
+    header = "Track selection for {0} scheduled <t:{1}:R>".format(evt_name, start)
+    response = [header]
+    times = []
+    for evt in evts:
+        if not track_filter or evt.has_track(track):
+            response.append(formatters.format_track_selection(evt, verbose))
+            times.append(evt.start_time)
+    if len(response) == 1:
+        response.append("No results :(")
+    boundary = None
+    if not from_time:
+        # private lobby lineups start from the current minute,
+        # public ones last until the Mini-Prix ends
+        boundary = evts[0].end_time if private else evts[-1].end_time
+    return '\n'.join(response), response_cache.get_expiry(boundary, times, now)
+
+
 async def post_miniprix_thread(event_type):
     channel = bot.get_channel(int(env["SCHEDULE_EDIT_CHANNEL"]))
     ctype = discord.ChannelType.public_thread
     thread_name = "See {0} schedule".format(formatters.event_display_names.get(event_type))
     thread = await channel.create_thread(name=thread_name, message=None, auto_archive_duration=10080, type=ctype)
 
-    err, response = _create_miniprix_message(event_type, None, None, False)
+    args = (event_type, None, None, False, False)
+    err, response = await flights.run("miniprix", args, lambda: _create_miniprix_message(*args))
     if not response:
         return
 
@@ -446,14 +667,16 @@ async def _edit_miniprix_message(mp_type):
         env[msg_url_key] = msg.jump_url
 
     utils.log("Updating {0} thread...".format(mp_type))
-    err, response = _create_miniprix_message(mp_type, None, None, False)
+    args = (mp_type, None, None, False, False)
+    err, response = await flights.run("miniprix", args, lambda: _create_miniprix_message(*args))
     if not err and response:
         await msg.edit(response)
     utils.log("Update complete.")
 
 
+# named so as not to shadow the miniprix module, used by lazily built managers
 @bot.slash_command(name="miniprix", description="List the track selection for the ongoing or next Mini-Prix")
-async def miniprix(
+async def miniprix_command(
         ctx: discord.ApplicationContext,
         event_type: discord.Option(str, autocomplete=discord.utils.basic_autocomplete(get_mp_types)),
         track_filter: discord.Option(str, required=False, autocomplete=discord.utils.basic_autocomplete(get_tracks),
@@ -466,14 +689,132 @@ async def miniprix(
     utils.log(f"{ctx.author.name} used {ctx.command}.")
     private = "Private" in event_type
     event_type = ui.mp_event_choices.get(event_type)
-    err, response = _create_miniprix_message(event_type, track_filter, utc_time, verbose, private)
+    args = (event_type, track_filter, utc_time, verbose, private)
+    err, response = await _run_query(ctx, "miniprix", args, lambda: _create_miniprix_message(*args))
+    await ctx.respond(err or response)
+
+
+# how far ahead to look for races on a track
+FINDTRACK_HORIZON = timedelta(weeks=12)
+TIP_FINDTRACK_TRACK = "The track to look for."
+TIP_FINDTRACK_COUNT = "How many races to display - must be from 1 to {0} (default 5)".format(MAX_COUNT_VALUE)
+
+
+def _iter_track_races(event_type, private, track, from_time, until):
+    """ Races on track from the right managers, Machine Shuffle lineups
+        on weekends if it is on.
+    """
+    if event_type == "classicprix":
+        mgr = pb.pcmp_mgr if private else pb.cmp_mgr
+        return mgr.iter_track(track, from_time, until)
+    if private:
+        mgr, shuffle_mgr = pb.pmp_mgr, pb.psmp_mgr
+    else:
+        mgr, shuffle_mgr = pb.mp_mgr, pb.smp_mgr
+    if not pb.is_shuffle_on():
+        return mgr.iter_track(track, from_time, until)
+    is_weekday = pb.slot2mgr.is_weekday
+    weekday = (evt for evt in mgr.iter_track(track, from_time, until)
+               if is_weekday(evt.start_time))
+    weekend = (evt for evt in shuffle_mgr.iter_track(track, from_time, until)
+               if not is_weekday(evt.start_time))
+    return heapq.merge(weekday, weekend, key=lambda evt: evt.start_time)
+
+
+def _create_findtrack_message(event_type, track_choice, count, utc_time, verbose, private=False):
+    """
+    """
+    response = None
+    err, from_time = _validate_utc_time(utc_time)
+    if err:
+        return err, response
+    if event_type == "classicprix":
+        track = ui.cmp_track_choices.get(track_choice)
+    else:
+        track = ui.mp_track_choices.get(track_choice)
+    if not track:
+        return "Disqualified! Unknown track '{0}'.".format(track_choice), response
+
+    now = datetime.now(timezone.utc)
+    args = (event_type, track_choice, count, from_time, verbose, private)
+    return err, responses.get("findtrack", args,
+            lambda: _compute_findtrack_message(*args, track, now), now)
+
+
+def _compute_findtrack_message(event_type, track_choice, count, from_time, verbose, private, track, now):
+    timestamp = from_time or now
+    until = timestamp + FINDTRACK_HORIZON
+    if event_type == "ninetynine":
+        races = pb.r99_mgr.iter_track(track, timestamp, until)
+        evt_name = pb.r99_mgr.name
+        fmt_func = formatters.format_track_choice
+    else:
+        races = _iter_track_races(event_type, private, track, timestamp, until)
+        evt_name = formatters.event_display_names.get(event_type)
+        if private:
+            evt_name = "Private {0}".format(evt_name)
+        evt_name = "{0} races".format(evt_name)
+        fmt_func = formatters.format_track_selection
+    response = ["Next {0} on {1}:".format(evt_name, track_choice)]
+    evts = list(itertools.islice(races, count))
+    for evt in evts:
+        response.append(fmt_func(evt, verbose))
+    if len(response) == 1:
+        response.append("No results :(")
+    boundary = None
+    if not from_time:
+        # races drop from the list once started, more may come in
+        # at the end of the horizon
+        boundary = schedule.cptime(now) + timedelta(minutes=1)
+        if len(evts) == count:
+            boundary = evts[0].start_time + timedelta(minutes=1)
+    return '\n'.join(response), response_cache.get_expiry(boundary, [evt.start_time for evt in evts], now)
+
+
+@bot.slash_command(name="findtrack", description="List the next Mini-Prix or 99 races on a track")
+async def findtrack(
+        ctx: discord.ApplicationContext,
+        event_type: discord.Option(str, autocomplete=discord.utils.basic_autocomplete(get_findtrack_types)),
+        track: discord.Option(str, autocomplete=discord.utils.basic_autocomplete(get_tracks),
+                            description=TIP_FINDTRACK_TRACK),
+        count: discord.Option(int, required=False, default=5, description=TIP_FINDTRACK_COUNT),
+        utc_time: discord.Option(str, required=False, description=TIP_WHEN_FROM_TIME),
+        verbose: discord.Option(bool, required=False, default=False, description=TIP_MINIPRIX_VERBOSE),
+        ):
+    """
+    """
+    utils.log(f"{ctx.author.name} used {ctx.command}.")
+    if not 0 < count <= MAX_COUNT_VALUE:
+        err, response = "Disqualified! Invalid 'count' value {0}. Must be between 1 and 12.".format(count), None
+    else:
+        private = "Private" in event_type
+        event_type = ui.findtrack_event_choices.get(event_type)
+        args = (event_type, track, count, utc_time, verbose, private)
+        err, response = await _run_query(ctx, "findtrack", args, lambda: _create_findtrack_message(*args))
     await ctx.respond(err or response)
 
 
 def _ninetynine(timestamp=None):
     """
     """
-    return '\n'.join(pb.r99_mgr.get_formatted_events(timestamp))
+    now = datetime.now(timezone.utc)
+    return responses.get("ninetynine", (timestamp,),
+            lambda: _compute_ninetynine(timestamp, now), now)
+
+
+def _compute_ninetynine(timestamp, now):
+    evts = pb.r99_mgr.list_events(timestamp=timestamp or now)
+    response = '\n'.join(pb.r99_mgr.format_events(evts, timestamp))
+    if not evts:
+        return response, None
+    times = [evt.start_time for evt in evts]
+    boundary = None
+    if timestamp:
+        times.append(timestamp)
+    else:
+        # races change every minute
+        boundary = evts[0].end_time
+    return response, response_cache.get_expiry(boundary, times, now)
 
 
 @bot.slash_command(name="ninetynine", description="List the track selection for the upcoming 99 races")
@@ -487,19 +828,20 @@ async def ninetynine(
     response = None
     err, from_time = _validate_utc_time(utc_time)
     if not err:
-        response = _ninetynine(from_time)
+        response = await _run_query(ctx, "ninetynine", (from_time,), lambda: _ninetynine(from_time))
     await ctx.respond(err or response)
 
 
-def get_missing_event_types(evts):
+def get_missing_event_types(evts, timestamp=None):
     """ Print the next occurence of events of a type
-        missing from the must-have list
+        missing from the must-have list, after timestamp
+        or current time if None.
     """
     present_evts = list(set([evt.name for evt in evts]))
     results = []
     # we want to show the next Glitch GP if available
     if "glitchgp" not in present_evts:
-        extra = _when_secret_league(pb.slot2mgr, 1, None)
+        extra = _when_secret_league(pb.slot2mgr, 1, timestamp)
         if extra:
             results.append(extra[0])
 
@@ -508,7 +850,7 @@ def get_missing_event_types(evts):
         if mprix[0] not in present_evts and mprix[1] not in present_evts:
             # for mirrored prix, we query both names but will only get the closest
             # that is not a glitch gp
-            extra = pb.slot2mgr.when_event(names=mprix, count=5)
+            extra = pb.slot2mgr.when_event(names=mprix, count=5, timestamp=timestamp)
             for item in extra:
                 if not item.glitch:
                     results.append(item)
@@ -517,7 +859,7 @@ def get_missing_event_types(evts):
     # now add other events that don't have a mirror version
     for name in ["miniprix", "classicprix"]:
         if name not in present_evts:
-            extra = pb.slot2mgr.when_event(names=[name], count=1)
+            extra = pb.slot2mgr.when_event(names=[name], count=1, timestamp=timestamp)
             if extra:
                 results.append(extra[0])
 
@@ -534,18 +876,16 @@ def format_schedule_edit(event_type, message):
     return message
 
 
-def kick_off_mp_update(mp_evt):
-    kickoff_time = mp_evt.end_time
-
-    @tasks.loop(time=kickoff_time.time(), count=1)
-    async def start_mp_edit():
-        await _edit_miniprix_message(mp_evt.name)
-
-    utils.log("{0} will be edited at {1}.".format(mp_evt.name, kickoff_time.strftime("%H:%M")))
-    start_mp_edit.start()
+async def _update_bot_status(bot):
+    content, start_time = await flights.run("status", (), _get_bot_status)
+    await apiadapter.update_activity(bot, content, start_time)
+    return content
 
 
-async def _update_bot_status(bot):
+def _get_bot_status():
+    """ Returns the status text and the start time of the Grand Prix
+        it is about.
+    """
     gps = ui.event_choices["Grand Prix"] + ["glitchgp"]
     evt = pb.slot2mgr.get_current_event()
     if evt.name not in gps:
@@ -559,24 +899,44 @@ async def _update_bot_status(bot):
             content = "{0} soon.".format(evt_name)
     else:
         content = "Now: " + formatters.event_display_names.get(evt.name, evt.name)
-    await apiadapter.update_activity(bot, content, evt.start_time)
-    return content
+    return content, evt.start_time
+
 
+async def _create_schedule_message():
+    """ Returns the ongoing event, the board lines and when they change.
+    """
+    return await flights.run("board", (), _get_schedule_message)
+
+
+def _get_schedule_message():
+    now = datetime.now(timezone.utc)
+    return responses.get("board", (), lambda: _compute_schedule_message(now), now)
 
-def _create_schedule_message():
+
+def _compute_schedule_message(now):
+    """ Returns the ongoing event, the board lines and their expiry,
+        the next event boundary on slot 1 or slot 2 that changes them.
+    """
     glitch_evts = ui.event_choices.get("Glitch 99")
-    evts = pb.slot2mgr.list_events(next=119)
-    glitches = pb.slot1mgr.when_event(names=glitch_evts, count=5, limit=119)
+    evts = pb.slot2mgr.list_events(timestamp=now, next=119)
+    # one more than shown, to know when it comes within reach
+    next_glitches = pb.slot1mgr.when_event(names=glitch_evts, count=6, timestamp=now)
+    glitch_until = now + timedelta(minutes=119)
+    glitches = [glitch for glitch in next_glitches[:5] if glitch.start_time <= glitch_until]
     if not evts:
         utils.log("Could not fetch any event :(")
-        return []
+        return (None, [], None), None
+    if len(evts) > 10:
+        # the ongoing event and the next nine are shown, until it ends
+        boundaries = [evts[0].end_time]
+    else:
+        boundaries = [response_cache.get_list_boundary(evts, 119)]
+    if glitches:
+        boundaries.append(glitches[0].start_time)
+    if len(glitches) < 5 and len(next_glitches) > len(glitches):
+        boundaries.append(next_glitches[len(glitches)].start_time - timedelta(minutes=119))
     response = ["F-Zero 99 Upcoming events in your local time:"]
     ongoing_evt = evts[0].name
-    if ongoing_evt in ("miniprix", "classicprix"):
-        # TODO: this may get kicked off multiple times if the schedule
-        # is edited several times while the event is ongoing.
-        # It is not causing any known issues though.
-        kick_off_mp_update(evts[0])
     ongoing_evt_end = evts[0].end_time
     ongoing_str = formatters.format_current_event(ongoing_evt, ongoing_evt_end)
     response.append(format_schedule_edit(ongoing_evt, ongoing_str))
@@ -589,41 +949,80 @@ def _create_schedule_message():
             response.append(formatters.format_glitch_event(glitch))
 
     # Also show events of desired types that aren't occuring soon
-    missing_evts = get_missing_event_types(evts[:10])
+    missing_evts = get_missing_event_types(evts[:10], now)
     if missing_evts:
         response.append("\nFuture events:")
         for evt in missing_evts:
             future_str = formatters.format_future_event(evt)
             response.append(format_schedule_edit(evt.name, future_str))
-    return response
+        boundaries.append(missing_evts[0].start_time)
+    shown = evts[1:10] + glitches + missing_evts
+    expires = response_cache.get_expiry(min(boundaries), [evt.start_time for evt in shown], now)
+    return (evts[0], response, expires), expires
 
 
 async def post_schedule_message():
     channel = bot.get_channel(int(env["SCHEDULE_EDIT_CHANNEL"]))
 
-    response = _create_schedule_message()
+    ongoing, response, expires = await _create_schedule_message()
     if not response:
         return
 
     msg = await channel.send('\n'.join(response))
     return msg.id
 
-@tasks.loop(seconds=int(env.get("REFRESH_INTERVAL"), 10) * 60)
-async def edit_schedule_message():
-    channel = bot.get_channel(int(env["SCHEDULE_EDIT_CHANNEL"]))
-    msg_id = int(env["ANNOUNCE_MSG_ID"])
-    msg = await channel.fetch_message(msg_id)
 
-    response = _create_schedule_message()
+async def edit_schedule_message(last_content=None):
+    """ Edits the board if it changed from last_content and updates the
+        bot status. Returns the board content, the ongoing event and when
+        the board changes next.
+    """
+    ongoing, response, expires = await _create_schedule_message()
     if not response:
-        return
+        return last_content, ongoing, expires
 
-    # Edit message in place
-    await msg.edit('\n'.join(response))
+    content = '\n'.join(response)
+    if content != last_content:
+        channel = bot.get_channel(int(env["SCHEDULE_EDIT_CHANNEL"]))
+        msg_id = int(env["ANNOUNCE_MSG_ID"])
+        msg = await channel.fetch_message(msg_id)
+        # Edit message in place
+        await msg.edit(content)
 
     # Update status
     if not env.get("TICKER_OVERRIDE"):
         await _update_bot_status(bot)
+    return content, ongoing, expires
+
+
+async def refresh_schedule_board(max_staleness):
+    """ Refreshes the board whenever an event boundary on slot 1, slot 2
+        or Mini-Prix changes it, sleeping until then instead of polling.
+        Refreshes happen at least every max_staleness, which keeps the bot
+        status countdown current. Mini-Prix threads are edited once their
+        Mini-Prix ends.
+    """
+    content = None
+    mp_evt = None
+    while True:
+        now = datetime.now(timezone.utc)
+        wake = now + max_staleness
+        try:
+            if mp_evt and mp_evt.end_time <= now:
+                await _edit_miniprix_message(mp_evt.name)
+                mp_evt = None
+            content, ongoing, expires = await edit_schedule_message(content)
+            if ongoing and ongoing.name in ("miniprix", "classicprix"):
+                mp_evt = ongoing
+            if expires and expires < wake:
+                wake = expires
+            if mp_evt and mp_evt.end_time < wake:
+                wake = mp_evt.end_time
+        except Exception as exc:
+            # keep refreshing, the next attempt may succeed
+            utils.log("Failed to refresh the schedule board: '{0}'".format(exc))
+        delay = max((wake - datetime.now(timezone.utc)).total_seconds(), 0)
+        await asyncio.sleep(delay + BOARD_REFRESH_DELAY)
 
 
 ### Festival League auto-update 99 race schedule ###
@@ -711,13 +1110,17 @@ async def explain(
         topic: discord.Option(str, autocomplete=discord.utils.basic_autocomplete(get_topics)),
         ):
     utils.log(f"{ctx.author.name} used {ctx.command}.")
-    await ctx.respond(explainer.explain(topic))
+    response = await _run_query(ctx, "explain", (topic,), lambda: explainer.explain(topic))
+    await ctx.respond(response)
 
 
 @bot.slash_command(name="ping", description="Sends the bot's latency.", guild_ids=[env['TEST_GUILD_ID']])
 async def ping(ctx): # a slash command will be created with the name "ping"
     utils.log(f"{ctx.author.name} used {ctx.command}.")
-    await ctx.respond(f"Pong! Latency is {bot.latency}")
+    calls, coalesced = flights.get_totals()
+    counts = ", ".join("{0} {1}/{2}".format(kind, *flights.counts[kind]) for kind in sorted(flights.counts))
+    stats = "Coalesced {0} of {1} schedule queries ({2}).".format(coalesced, calls, counts or "none yet")
+    await ctx.respond(f"Pong! Latency is {bot.latency}\n{stats}")
 
 
 if __name__ == "__main__":
@@ -1,5 +1,9 @@
 from datetime import datetime, timedelta, timezone
 
+import bisect
+import math
+import threading
+
 # local imports
 from pengbot99 import events
 from pengbot99 import formatters
@@ -7,14 +11,32 @@ from pengbot99 import schedule
 from pengbot99 import utils
 
 
-def init_99_manager(name=None, glitch_mgr=None, env=None, minutes_offset=0):
+# parsed races by their schedule text
+_parsed_races = {}
+
+
+def parse_race(name):
+    """ Splits a 'Track1 <> Track2' race into a tuple of track names.
+        Races are parsed once, as schedules keep repeating them.
+    """
+    tracks = _parsed_races.get(name)
+    if tracks is None:
+        tracks = _parsed_races[name] = tuple(name.split(formatters.track_separators['choice']))
+    return tracks
+
+
+def init_99_manager(name=None, glitch_mgr=None, env=None, minutes_offset=0, nnsched=None):
+    """ nnsched is the loaded 99 races schedule. If None, it is loaded
+        from the config path set in env.
+    """
     if not name:
         name = FZ99Manager.NAME
-    if not env:
-        env = utils.load_env()
     # Common origin plus constant offset
     r99_origin = schedule.origin + timedelta(minutes=minutes_offset)
-    nnsched = schedule.load_schedule(env['CONFIG_PATH'], 'ninetynine_schedule')
+    if nnsched is None:
+        if not env:
+            env = utils.load_env()
+        nnsched = schedule.load_schedule(env['CONFIG_PATH'], 'ninetynine_schedule')
     r99mgr = schedule.Slot1ScheduleManager(r99_origin, nnsched)
     if glitch_mgr:
         return FZ99Manager(r99mgr, glitch_mgr)
@@ -29,13 +51,96 @@ class ChoiceRaceManager(object):
         super().__init__()
         self.name = event_name
         self.mgr = cycle_manager
+        # ((start time, minutes), races, track index), built on first use
+        # and assigned at once, so that concurrent readers see all or none.
+        # The track index maps tracks to the indices of the races offering them.
+        self._track_table = None
+        # queries run on several threads, the table is built once
+        self._track_table_lock = threading.Lock()
+
+    def _get_period(self):
+        """ A (start time, minutes) tuple for the run of minutes after
+            which races repeat themselves.
+        """
+        return self.mgr.get_timeline_period()
+
+    def _list_period_races(self, start, minutes):
+        """ (offset, name, event) tuples for the races over the period,
+            with offsets in minutes from start. The races of the schedule's
+            own period are listed once, then repeated.
+        """
+        cycle_minutes = self.mgr.get_timeline_period()[1]
+        from_time = start - timedelta(minutes=1)
+        until = start + timedelta(minutes=cycle_minutes - 1)
+        evts = list(self.mgr.iter_events(from_time, until=until))
+        races = []
+        for cycles in range(0, minutes, cycle_minutes):
+            for evt in evts:
+                offset = cycles + (evt.start_time - start) // timedelta(minutes=1)
+                races.append((offset, evt.name, evt))
+        return races
+
+    def _get_track_table(self):
+        if self._track_table is None:
+            with self._track_table_lock:
+                if self._track_table is None:
+                    self._build_track_index()
+        return self._track_table
+
+    def _build_track_index(self):
+        start, minutes = self._get_period()
+        races = self._list_period_races(start, minutes)
+        index = {}
+        for idx, (offset, name, evt) in enumerate(races):
+            for track in parse_race(name):
+                index.setdefault(track, []).append(idx)
+        self._track_table = ((start, minutes), races, index)
+        return self._track_table
+
+    def iter_track(self, track, timestamp=None, until=None, mirrored=None):
+        """ Yields the races offering track in order, from the one at the
+            timestamp minute. Stops after 'until' if it is set.
+            If mirrored is a bool, only races on the mirrored track, or on
+            the regular one, are listed.
+        """
+        (start, minutes), races, track_index = self._get_track_table()
+        if mirrored is None:
+            names = [track, 'm' + track]
+        else:
+            names = ['m' + track if mirrored else track]
+        indices = sorted(idx for name in names for idx in track_index.get(name, ()))
+        if not indices:
+            return
+        offsets = [races[idx][0] for idx in indices]
+        timestamp = timestamp or datetime.now(timezone.utc)
+        period, minute = divmod((schedule.cptime(timestamp) - start) // timedelta(minutes=1), minutes)
+        pos = bisect.bisect_left(offsets, minute)
+        while True:
+            for idx in indices[pos:]:
+                offset, name, evt = races[idx]
+                start_time = start + timedelta(minutes=period * minutes + offset)
+                if until is not None and start_time > until:
+                    return
+                yield events.Event(
+                        name=name, cycle=self.mgr.get_cycle_count(start_time),
+                        cycle_minute=evt.start_minute,
+                        start_minute=evt.start_minute, end_minute=evt.end_minute,
+                        schedname=evt.schedule_name, start_time=start_time,
+                    )
+            pos = 0
+            period += 1
 
     def list_events(self, timestamp=None, next=12):
         return self.mgr.list_events(timestamp=timestamp, next=next)
 
     def get_formatted_events(self, from_time=None, next=12):
-        response = []
         evts = self.list_events(timestamp=from_time, next=next)
+        return self.format_events(evts, from_time)
+
+    def format_events(self, evts, from_time=None):
+        """ Message lines for races listed from from_time, or from now.
+        """
+        response = []
         if evts and from_time:
             time_str = formatters.format_discord_timestamp(from_time, inline=True)
             header = "{} events {} local time:"
@@ -52,33 +157,76 @@ class FZ99Manager(ChoiceRaceManager):
     """
     NAME = "F-Zero 99 Races"
     # Glitch events will be named as one of these
-    GLITCH_EVT_NAMES = ("glitch99", "Mystery_1", "Mystery_2", "Mystery_3", "Mystery_4", "Mystery_5", "Mystery_6", "Mystery_7")
+    GLITCH_EVT_NAMES = frozenset((
+            "glitch99", "Mystery_1", "Mystery_2", "Mystery_3", "Mystery_4", "Mystery_5",
+            "Mystery_6", "Mystery_7",
+        ))
 
     def __init__(self, cycle_manager, glitch_manager):
         super().__init__("F-Zero 99 Races", cycle_manager)
         self.glitch_manager = glitch_manager
 
     def is_glitch(self, evt):
-        if evt.name in self.GLITCH_EVT_NAMES:
-            if evt.name == "glitch99":
-                evt._name = formatters.glitch_rotation[evt.cycle % len(formatters.glitch_rotation)]
-            return True
-        return False
+        return evt.name in self.GLITCH_EVT_NAMES
+
+    def _get_glitches(self, evts):
+        """ The Glitch events among evts, named after their track.
+        """
+        return [formatters.name_glitch_event(evt) for evt in evts if self.is_glitch(evt)]
+
+    @staticmethod
+    def _get_glitch_name(name, glitch_name):
+        # Glitch always replaces the event's track 1 as per the schedule
+        tracks = (glitch_name,) + parse_race(name)[1:]
+        return formatters.track_separators['choice'].join(tracks)
 
     @staticmethod
-    def _apply_glitch_override(evts, glitch):
+    def _apply_glitch_overrides(evts, glitches):
+        """ Races and Glitch events are both in start time order, and
+            Glitch events do not overlap. A single sweep finds the Glitch
+            each race starts in, if any. Returns the races, with renamed
+            copies of those run during a Glitch.
+        """
+        idx = 0
+        races = []
         for evt in evts:
-            if evt.start_time >= glitch.start_time and evt.start_time < glitch.end_time:
+            while idx < len(glitches) and glitches[idx].end_time <= evt.start_time:
+                idx += 1
+            if idx < len(glitches) and glitches[idx].start_time <= evt.start_time:
                 # this event occurs during a Glitch
-                track1 = evt.name.split(' ')[0]
-                # Glitch always replaces the event's track 1 as per the schedule
-                evt._name = evt._name.replace(track1, glitch.name)
-        return evts
+                evt = evt.renamed(FZ99Manager._get_glitch_name(evt.glitched_name, glitches[idx].name))
+            races.append(evt)
+        return races
+
+    def _get_period(self):
+        """ Glitch 99 events and their rotation repeat too, races and
+            glitches line up again after both periods.
+        """
+        start, minutes = self.mgr.get_timeline_period()
+        glitch_minutes = self.glitch_manager.get_timeline_period()[1]
+        rotation_minutes = self.glitch_manager.sched.duration * len(formatters.glitch_rotation)
+        return (start, math.lcm(minutes, glitch_minutes, rotation_minutes))
+
+    def _list_period_races(self, start, minutes):
+        """ Races over the period, with Glitch overrides folded in.
+        """
+        races = super()._list_period_races(start, minutes)
+        offsets = [offset for offset, name, evt in races]
+        from_time = start - timedelta(minutes=1)
+        until = start + timedelta(minutes=minutes - 1)
+        # a Glitch started before the period start may still be on
+        from_time -= timedelta(minutes=self.glitch_manager.sched.duration)
+        glitches = self._get_glitches(self.glitch_manager.iter_events(from_time, until=until))
+        for glitch in glitches:
+            first = (glitch.start_time - start) // timedelta(minutes=1)
+            last = (glitch.end_time - start) // timedelta(minutes=1)
+            for idx in range(bisect.bisect_left(offsets, first), bisect.bisect_left(offsets, last)):
+                offset, name, evt = races[idx]
+                races[idx] = (offset, self._get_glitch_name(name, glitch.name), evt)
+        return races
 
     def list_events(self, timestamp=None, next=12):
         slot1 = self.glitch_manager.list_events(timestamp, next)
         evts = super().list_events(timestamp, next)
-        for item in slot1:
-            if self.is_glitch(item):
-                evts = self._apply_glitch_override(evts, item)
-        return evts
+        glitches = self._get_glitches(slot1)
+        return self._apply_glitch_overrides(evts, glitches)
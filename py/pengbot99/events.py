@@ -9,28 +9,74 @@ class UndefinedEventData(Exception):
 
 
 class Event(object):
-    def __init__(self, name, cycle=0, cycle_minute=0, start_minute=0, end_minute=0, rotation=None, rotation_offset=0, schedname=None):
+    """ Events are immutable, so that the same ones can be shared by
+        caches, commands and threads. Glitched, renamed or shortened
+        variants are new events, see replace().
+    """
+    # Timelines create many events, so they do without a __dict__
+    __slots__ = (
+            '_name', 'cycle', 'cycle_minute', 'start_minute', 'end_minute', 'rotation',
+            'rotation_offset', 'start_time', 'schedule_name', 'glitch',
+        )
+    # every slot, subclass ones included
+    _all_slots = __slots__
+    # replace() field names that differ from the slot they set
+    _fields = {'name': '_name', 'schedname': 'schedule_name'}
+    # slots derived from the others, reset by replace()
+    _derived = ()
+
+    def __init__(self, name, cycle=0, cycle_minute=0, start_minute=0, end_minute=0, rotation=None, rotation_offset=0, schedname=None,
+                 start_time=None, glitch=False):
         super().__init__()
+        init = object.__setattr__
         # the event's internal name
-        self._name = name
+        init(self, '_name', name)
         # what is the event's cycle number
-        self.cycle = cycle
+        init(self, 'cycle', cycle)
         # what minute of the cycle the event was created in
-        self.cycle_minute = cycle_minute
+        init(self, 'cycle_minute', cycle_minute)
         # what minute of the cycle the event starts at
-        self.start_minute = start_minute
+        init(self, 'start_minute', start_minute)
         # what minute of the cycle the event ends at
-        self.end_minute = end_minute
+        init(self, 'end_minute', end_minute)
         # what rotation this event comes from, if any
-        self.rotation = rotation
+        init(self, 'rotation', rotation)
         # what position in the rotation the event occupies
-        self.rotation_offset = rotation_offset
+        init(self, 'rotation_offset', rotation_offset)
         # start time
-        self.start_time = None
+        init(self, 'start_time', start_time)
         # the name of the schedule this event was created from
-        self.schedule_name = schedname
+        init(self, 'schedule_name', schedname)
         # is a glitch active?
-        self.glitch = False
+        init(self, 'glitch', glitch)
+
+    def __setattr__(self, name, value):
+        raise EventModificationError("Events are immutable, use replace() to change {0}.".format(name))
+
+    def __delattr__(self, name):
+        raise EventModificationError("Events are immutable, cannot delete {0}.".format(name))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def replace(self, **changes):
+        """ Returns a copy of self with the given fields changed, named as
+            in __init__. Self is left as is.
+        """
+        new_evt = object.__new__(type(self))
+        for slot in self._all_slots:
+            object.__setattr__(new_evt, slot, getattr(self, slot))
+        for slot in self._derived:
+            object.__setattr__(new_evt, slot, None)
+        for field, value in changes.items():
+            slot = self._fields.get(field, field)
+            if slot not in self._all_slots:
+                raise TypeError("Unknown event field '{0}'.".format(field))
+            object.__setattr__(new_evt, slot, value)
+        return new_evt
 
     @property
     def name(self):
@@ -53,33 +99,32 @@ class Event(object):
         """
         return self.end_minute - self.start_minute
 
-    def set_start_time(self, timestamp):
+    def renamed(self, name):
+        """ Returns a copy of self under another internal name.
         """
-        """
-        self.start_time = timestamp
+        return self.replace(name=name)
 
-    def delay(self, delta):
+    def delayed(self, delta):
         """
-        Delay an event's start by a timedelta.
+        Returns a copy of self starting later by a timedelta.
         The event must still start before its current end time.
         This makes the event's duration shorter.
         """
         if delta.seconds >= self.duration * 60:
             raise EventModificationError("Event cannot be delayed more than its duration.")
         minutes = delta.seconds // 60
-        self.set_start_time(self.start_time + delta)
-        self.start_minute += minutes
+        return self.replace(start_time=self.start_time + delta, start_minute=self.start_minute + minutes)
 
     def cut_short(self, delta):
         """
-        Adjust an event to end earlier than its currently set time.
+        Returns a copy of self ending earlier than its currently set time.
         The event must end no earlier than its current start time.
         This makes the event's duration shorter.
         """
         if delta.seconds >= self.duration * 60:
             raise EventModificationError("Event cannot be cut short more than its duration.")
         minutes = delta.seconds // 60
-        self.end_minute -= minutes
+        return self.replace(end_minute=self.end_minute - minutes)
 
     @property
     def end_time(self):
@@ -89,15 +134,16 @@ class Event(object):
             return None
         return self.start_time + timedelta(minutes=self.duration)
 
-    def get_seconds_left(self):
+    def get_seconds_left(self, now=None):
         """ How many seconds are left in this event.
-            This will query current time.
+            This will query current time, unless now is given.
             If current time is beyond the event's end time,
             this will be zero.
         """
         if not self.end_time:
             raise UndefinedEventData("End time not set for event {0}".format(self.name))
-        left = (self.end_time - datetime.now(timezone.utc)).total_seconds()
+        now = now or datetime.now(timezone.utc)
+        left = (self.end_time - now).total_seconds()
         if left < 0:
             return 0
         return int(left)
@@ -111,40 +157,39 @@ class Event(object):
             return True
         return False
 
+    def as_glitch(self):
+        """ Returns a glitched copy of self, cycle info included.
+        """
+        return self.replace(glitch=True)
+
     def copy_as_glitch(self):
         """ Returns a glitched copy of self.
             This intentionally does not bring over cycle info.
         """
-        new_evt = Event(name=self.name, start_minute=self.start_minute, end_minute=self.end_minute)
-        new_evt.set_start_time(self.start_time)
-        new_evt.glitch = True
-        return new_evt
+        return Event(name=self.name, start_minute=self.start_minute, end_minute=self.end_minute,
+                     start_time=self.start_time, glitch=True)
 
     def split_by_glitch(self, glitch_first, split_delta):
-        """ Change this event into two events, one being a glitch,
+        """ Split this event into two events, one being a glitch,
             the other a shorter version of self.
 
-            split_delta is an int. It is the point in the event when
+            split_delta is a timedelta. It is the point in the event when
             the split occurs. This value must be less than the event
             duration, otherwise an error will occur.
 
             glitch_first is a boolean. Use True to make the first part
             of the event a glitch, false to have it be the second part.
-            Self is modified in place with adjusted start/end time.
+            Self is left as is.
 
-            Returns the glitched event.
+            Returns a (first part, second part) tuple.
         """
         if split_delta.total_seconds() < 60:
             msg = "Given value ({0}) would create a zero duration event."
             raise EventModificationError(msg.format(split_delta.seconds))
         glitch_event = self.copy_as_glitch()
         if glitch_first is True:
-            glitch_event.cut_short(split_delta)
-            self.delay(split_delta)
-        else:
-            self.cut_short(split_delta)
-            glitch_event.delay(split_delta)
-        return glitch_event
+            return glitch_event.cut_short(split_delta), self.delayed(split_delta)
+        return self.cut_short(split_delta), glitch_event.delayed(split_delta)
 
     def __str__(self):
         """
@@ -154,47 +199,65 @@ class Event(object):
 
 
 class MiniPrixEvent(Event):
-    def __init__(self, mp_type, mp_id, race1, race2, race3, start_minute=0, end_minute=0, mirrored="000", schedname=None):
+    __slots__ = ('_mode', '_race1', '_race2', '_race3', '_mirrored', '_races', '_full_name')
+    _all_slots = Event._all_slots + __slots__
+    _fields = dict(Event._fields, mp_type='_mode', race1='_race1', race2='_race2', race3='_race3',
+                   mirrored='_mirrored')
+    _derived = ('_races', '_full_name')
+
+    def __init__(self, mp_type, mp_id, race1, race2, race3, start_minute=0, end_minute=0, mirrored="000", schedname=None,
+                 start_time=None):
         if mp_type == "classicprix":
             code = "ClassicMiniPrix"
         else:
             code = "MiniPrix"
         miniprix_id = "{:s}{:s}".format(code, mp_id)
-        name = "{0} > {1} > {2} ({3})".format(race1, race2, race3, miniprix_id)
-        super().__init__(name=miniprix_id, start_minute=start_minute, end_minute=end_minute, schedname=schedname)
-        self._mode = mp_type
-        self._race1 = race1
-        self._race2 = race2
-        self._race3 = race3
-        self._mirrored = mirrored
-        self._mpid = miniprix_id
+        super().__init__(name=miniprix_id, start_minute=start_minute, end_minute=end_minute, schedname=schedname,
+                         start_time=start_time)
+        init = object.__setattr__
+        init(self, '_mode', mp_type)
+        init(self, '_race1', race1)
+        init(self, '_race2', race2)
+        init(self, '_race3', race3)
+        init(self, '_mirrored', mirrored)
+        # derived names, built once on first use. They only depend on the
+        # fields above, so setting them does not change the event.
+        init(self, '_races', None)
+        init(self, '_full_name', None)
 
     @property
     def name(self):
-        name_fmt = "{0} > {1} > {2} ({3})"
-        return name_fmt.format(self.race1, self.race2, self.race3, self._name)
+        if self._full_name is None:
+            object.__setattr__(self, '_full_name', "{0} > {1} > {2} ({3})".format(*self.races, self._name))
+        return self._full_name
+
+    @property
+    def races(self):
+        """ The three track names, with an 'm' prefix for mirrored tracks.
+        """
+        if self._races is None:
+            tracks = (self._race1, self._race2, self._race3)
+            object.__setattr__(self, '_races', tuple(
+                    'm' + track if flag == '1' else track
+                    for track, flag in zip(tracks, self._mirrored)
+                ))
+        return self._races
 
     @property
     def race1(self):
-        if self._mirrored[0] == '1':
-            return 'm' + self._race1
-        return self._race1
+        return self.races[0]
 
     @property
     def race2(self):
-        if self._mirrored[1] == '1':
-            return 'm' + self._race2
-        return self._race2
+        return self.races[1]
 
     @property
     def race3(self):
-        if self._mirrored[2] == '1':
-            return 'm' + self._race3
-        return self._race3
+        return self.races[2]
 
     @property
     def mpid(self):
-        return self._mpid
+        return self._name
 
     @property
     def mode(self):
@@ -203,4 +266,4 @@ class MiniPrixEvent(Event):
     def has_track(self, track_name):
         if track_name in (self._race1, self._race2, self._race3):
             return True
-        return False
\ No newline at end of file
+        return False
@@ -70,11 +70,12 @@ TOPICS_BASE = {
 
 
 class Explainer(object):
-    def __init__(self, config, mgr):
+    def __init__(self, config, get_mgr):
         self._topics = TOPICS_BASE
         self._initialize_topics(config)
-        # a slot2mgr instance used by GP rotation explainer
-        self._mgr = mgr
+        # returns the slot2mgr instance used by GP rotation explainer,
+        # so that it is only built when needed
+        self._get_mgr = get_mgr
 
     def _initialize_topics(self, config):
         if config:
@@ -91,11 +92,12 @@ class Explainer(object):
         Loads up a full rotation of Grand Prix to display
         how it is put together.
         """
-        cinfo = self._mgr.get_cycle_info(timestamp)
+        mgr = self._get_mgr()
+        cinfo = mgr.get_cycle_info(timestamp)
         gps = ui.event_choices.get("Grand Prix")
         rotation = cinfo.find_rotation(gps)
-        evts = self._mgr.when_event(names=gps, count=len(rotation), timestamp=timestamp)
-        current = self._mgr.get_events(timestamp=timestamp, count=1)[0]
+        evts = mgr.when_event(names=gps, count=len(rotation), timestamp=timestamp)
+        current = mgr.get_events(timestamp=timestamp, count=1)[0]
         if not current.name in gps:
             current = None
 
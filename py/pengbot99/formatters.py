@@ -199,6 +199,21 @@ def format_current_event(event_name, event_end):
     return discord_text.format(evt_name, end)
 
 
+# timestamps further than this from now show their date
+LONG_TIMESTAMP_DELTA = timedelta(hours=20)
+
+
+def get_timestamp_change(dt, now):
+    """ When format_discord_timestamp next changes its format for dt,
+        or None if it never will.
+    """
+    if dt - now > LONG_TIMESTAMP_DELTA:
+        return dt - LONG_TIMESTAMP_DELTA
+    if now - dt <= LONG_TIMESTAMP_DELTA:
+        return dt + LONG_TIMESTAMP_DELTA
+    return None
+
+
 def format_discord_timestamp(dt, inline=False):
     """ Flexible timestamp builder.
         If the event is not in the next few hours, it will use
@@ -207,7 +222,7 @@ def format_discord_timestamp(dt, inline=False):
         started sentence.
     """
     delta = dt - datetime.now(timezone.utc)
-    if abs(delta.total_seconds()) > timedelta(hours=20).total_seconds():
+    if abs(delta) > LONG_TIMESTAMP_DELTA:
         # Discord long date with short time
         t_format = 'f'
         if inline:
@@ -246,12 +261,17 @@ def format_future_event(evt):
 glitch_rotation = ("Mystery_3", "Mystery_4", "Mystery_5", "Mystery_6", "Mystery_7", )
 
 
-def format_glitch_event(evt):
-    """ Hacking in the glitch rotation!
+def name_glitch_event(evt):
+    """ Hacking in the glitch rotation! Returns a copy of a glitch99
+        event named after its Mystery track.
     """
     if evt.name == "glitch99":
-        evt._name = glitch_rotation[evt.cycle % len(glitch_rotation)]
-    return format_future_event(evt)
+        return evt.renamed(glitch_rotation[evt.cycle % len(glitch_rotation)])
+    return evt
+
+
+def format_glitch_event(evt):
+    return format_future_event(name_glitch_event(evt))
 
 
 def format_track_names(tracks, mode):
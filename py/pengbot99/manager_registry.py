@@ -0,0 +1,81 @@
+import threading
+import time
+
+# local imports
+from pengbot99 import utils
+
+
+class ManagerRegistry(object):
+    """ Schedule managers by name, each built on first access.
+        Builders are registered with a function taking no argument, which
+        may get other managers from the registry.
+        The time spent building each manager is recorded, without the time
+        spent building the managers it depends on.
+        Builds are serialized with a lock, so that managers can be warmed up
+        from another thread while commands are served.
+    """
+    def __init__(self):
+        super().__init__()
+        self._builders = {}
+        self._managers = {}
+        # name: seconds spent building the manager
+        self.build_times = {}
+        # callbacks run after each build, e.g. to save a cache
+        self._on_build = []
+        # time spent in nested builds, one entry per build in progress
+        self._nested = []
+        self._lock = threading.RLock()
+
+    def register(self, name, build_fn):
+        self._builders[name] = build_fn
+
+    def add_build_callback(self, callback_fn):
+        """ callback_fn is called with the name of each manager built.
+        """
+        self._on_build.append(callback_fn)
+
+    @property
+    def names(self):
+        return list(self._builders)
+
+    def is_built(self, name):
+        return name in self._managers
+
+    def get(self, name):
+        """ Returns the named manager, building it if needed.
+        """
+        if name in self._managers:
+            return self._managers[name]
+        with self._lock:
+            if name in self._managers:
+                return self._managers[name]
+            start = time.perf_counter()
+            self._nested.append(0.0)
+            try:
+                mgr = self._builders[name]()
+            finally:
+                nested = self._nested.pop()
+            elapsed = time.perf_counter() - start
+            if self._nested:
+                self._nested[-1] += elapsed
+            self._managers[name] = mgr
+            self.build_times[name] = elapsed - nested
+            utils.log("Built {0} in {1:.1f}ms.".format(name, (elapsed - nested) * 1000))
+            for callback_fn in self._on_build:
+                callback_fn(name)
+        return mgr
+
+    def warm_up(self, names=None):
+        """ Builds the named managers, or all of them, ahead of their first
+            use. Meant to run in a background thread.
+        """
+        if names is None:
+            names = self.names
+        timer = utils.PhaseTimer()
+        for name in names:
+            if name not in self._builders:
+                utils.log("Unknown schedule manager '{0}', not warming it up.".format(name))
+                continue
+            self.get(name)
+            timer.mark(name)
+        timer.log("Warmed up schedule managers")
@@ -1,12 +1,23 @@
 from datetime import datetime, timedelta, timezone
 
+import heapq
+import math
+import threading
+
 # local imports
 from pengbot99 import events
+from pengbot99 import schedule
 
 
 # 10 miniprix selection cycles for private MP queries
 # (one each minute)
 PMP_CYCLES = 10
+# private lobby lineups are kept for this many minutes ahead,
+# and extended once less than this minus PMP_TABLE_STEP remain.
+PMP_TABLE_MINUTES = 24 * 60
+PMP_TABLE_STEP = 60
+# private lobby races looked up at once when searching for a track
+PMP_TRACK_BATCH = 50
 
 
 def print_miniprix_rows(rows):
@@ -24,21 +35,121 @@ def _trim_schedule(sched):
         return sched
 
 
+# parsed lineups by their schedule text
+_parsed_lineups = {}
+
+
+def parse_lineup(lineup):
+    """ Splits a 'Track1 > Track2 > Track3' lineup into a tuple of track
+        names. Lineups are parsed once, as schedules keep repeating them.
+    """
+    tracks = _parsed_lineups.get(lineup)
+    if tracks is None:
+        tracks = _parsed_lineups[lineup] = tuple(lineup.split(' > '))
+    return tracks
+
+
+class LineupRing(object):
+    """ The lineups of a Mini-Prix schedule, merged with its mirroring
+        schedule and parsed once, read as a circular list.
+        Both schedules move on by one row for each Mini-Prix, so their rows
+        pair up again after the lcm of their lengths. Entry i has track row
+        i and the mirroring row shifted by the difference of their offsets.
+        Each entry is a (Mini-Prix ID, (race1, race2, race3), mirror flags)
+        tuple.
+    """
+    def __init__(self, sched, mirror=None, offset=0, mirror_offset=0):
+        super().__init__()
+        rows = _trim_schedule(sched)
+        if mirror:
+            mirror_rows = _trim_schedule(mirror)
+        else:
+            mirror_rows = [(0, "000")]
+        shift = offset - mirror_offset
+        entries = []
+        for idx in range(math.lcm(len(rows), len(mirror_rows))):
+            row = rows[idx % len(rows)]
+            mirror_row = mirror_rows[(idx + shift) % len(mirror_rows)]
+            mpid = "{:03d}.{:s}".format(int(row[0]), str(mirror_row[0]))
+            entries.append((mpid, parse_lineup(row[1]), mirror_row[1]))
+        self._entries = tuple(entries)
+        # track: [(entry index, race index, mirrored)], built on first use
+        self._track_index = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, idx):
+        return self._entries[idx % len(self._entries)]
+
+    def find_track(self, track, mirrored=None):
+        """ Returns (entry index, race index) tuples for the entries racing
+            on track, mirrored or not if mirrored is a bool.
+        """
+        if self._track_index is None:
+            index = {}
+            for idx, (mpid, tracks, flags) in enumerate(self._entries):
+                for race, (name, flag) in enumerate(zip(tracks, flags)):
+                    index.setdefault(name, []).append((idx, race, flag == '1'))
+            self._track_index = index
+        return [(idx, race) for idx, race, flag in self._track_index.get(track, [])
+                if mirrored is None or flag == mirrored]
+
+    def iter_window(self, first, count):
+        """ Yields count entries from entry first, wrapping around.
+        """
+        entries = self._entries
+        for idx in range(first, first + count):
+            yield entries[idx % len(entries)]
+
+
+def _eventify_lineups(name, start_time, lineups):
+    """ One MiniPrixEvent per lineup ring entry, a minute apart.
+    """
+    res = []
+    for idx, (mpid, (r1, r2, r3), mirror) in enumerate(lineups):
+        res.append(events.MiniPrixEvent(
+                name, mpid, r1, r2, r3,
+                start_minute=idx, end_minute=idx + 1, mirrored=mirror,
+                schedname=name, start_time=start_time + timedelta(minutes=idx),
+            ))
+    return res
+
+
+def find_mp_cycles(cycle_manager, event_name):
+    """ Look up a MP to determine how long it lasts.
+        We use this to set how many track selections to present.
+    """
+    next_mp = cycle_manager.when_event(names=[event_name], count=1)
+    if not next_mp:
+        return 0
+    return next_mp[0].duration
+
+
 class MiniPrixManager(object):
     """ For Public MiniPrix (Classic and Regular).
         Predicts the track selection line up for individual MiniPrix.
         Uses a Slot2Mgr as the cycle manager to read when the next MP event occurs.
         Optionally uses a mirroring schedule (for regular MP as of fz99 1.3)
+        mp_cycles can be supplied (e.g. from a cache) to skip looking it up.
     """
-    def __init__(self, event_name, cycle_manager, mp_schedule, mirror=None, offset=0, mirror_offset=0):
+    def __init__(self, event_name, cycle_manager, mp_schedule, mirror=None, offset=0, mirror_offset=0,
+                 mp_cycles=None):
         super().__init__()
         self.name = event_name
         self.mgr = cycle_manager
         self._mp_schedule = mp_schedule
         self._mirror_schedule = mirror
         self.mirror_lineup_offset = mirror_offset
-        self.mp_cycles = self._init_mp_cycles()
+        if mp_cycles is None:
+            mp_cycles = self._init_mp_cycles()
+        self.mp_cycles = mp_cycles
         self.lineup_offset = offset
+        self._ring = LineupRing(mp_schedule, mirror, offset, mirror_offset)
+        # (track, mirrored, mp_cycles): residues, see _get_track_residues
+        self._track_residues = {}
+        # queries run on several threads, residues are built once
+        self._residues_lock = threading.Lock()
 
     @property
     def schedule(self):
@@ -51,95 +162,113 @@ class MiniPrixManager(object):
         return _trim_schedule(self._mirror_schedule)
 
     def _init_mp_cycles(self):
-        """ Look up a MP to determine how long it lasts.
-            We use this to set how many track selections to present.
+        return find_mp_cycles(self.mgr, self.name)
+
+    def _iter_lineups(self, cycle):
+        """ The lineup ring entries for each Mini-Prix of a cycle.
         """
-        next_mp = self.mgr.when_event(names=[self.name], count=1)
-        if not next_mp:
-            return 0
-        return next_mp[0].duration
+        first = cycle * self.mp_cycles - self.lineup_offset
+        return self._ring.iter_window(first, self.mp_cycles)
 
-    def _get_start_mp_row(self, cycle):
-        """ 
+    def get_miniprix(self, timestamp=None, window=None):
+        """ The lineups of the ongoing or next Mini-Prix.
+            window is the cycle manager's resolve_window result for this
+            Mini-Prix, if it was already computed for timestamp.
         """
-        return (cycle * self.mp_cycles - self.lineup_offset) % len(self.schedule)
+        if window is None:
+            window = self.mgr.resolve_window(self.name, timestamp)
+        if not window:
+            return None
+        evt, cycle = window
+        return self.eventify_lineups(evt.start_time, self._iter_lineups(cycle))
 
-    def _get_start_mirror_row(self, cycle):
-        """ 
+    def _get_track_residues(self, track, mirrored):
+        """ Mini-Prix number k shows ring entry (k * mp_cycles - offset + s)
+            in its minute s. These entries repeat every 'period' Mini-Prix.
+            Returns the period and, for each k modulo it that races on
+            track, the matching minutes.
         """
-        return (cycle * self.mp_cycles - self.mirror_lineup_offset) % len(self.mirror_schedule)
-
-    def _build_rows_from_rotation(self, get_start_fn, sched, cycle):
-        first_row = get_start_fn(cycle)
-        last_row = first_row + self.mp_cycles
-        if last_row > len(sched):
-            # Because the mirror schedule length is 9 and there are 10 prix
-            # rows, it seems possible that doubling the table size may not
-            # be enough in edge cases so let's triple it.
-            rows = (sched * 3)[first_row:last_row]
-        else:
-            rows = sched[first_row:last_row]
-        return rows
-
-    def _get_track_selection_rows(self, cycle):
-        return self._build_rows_from_rotation(self._get_start_mp_row, self.schedule, cycle)
-
-    def _get_mirroring_rows(self, cycle):
-        if self._mirror_schedule:
-            return self._build_rows_from_rotation(self._get_start_mirror_row, self.mirror_schedule, cycle)
-        return [(0, "000")] * self.mp_cycles
-
-    def _get_mp_cycle(self, next_mp):
-        """ Deal with the case where multiple miniprix appear
-            in the cycle, hence we can't just rely on the mp count
-            from the CycleInfo object. We also need to find if any
-            miniprix already occured in the present cycle.
+        key = (track, mirrored, self.mp_cycles)
+        if key in self._track_residues:
+            return self._track_residues[key]
+        with self._residues_lock:
+            if key not in self._track_residues:
+                self._track_residues[key] = self._build_track_residues(track, mirrored)
+        return self._track_residues[key]
+
+    def _build_track_residues(self, track, mirrored):
+        length = len(self._ring)
+        period = length // math.gcd(self.mp_cycles, length)
+        entry_races = {}
+        for idx, race in self._ring.find_track(track, mirrored):
+            entry_races.setdefault(idx, []).append(race)
+        residues = []
+        for k in range(period):
+            first = k * self.mp_cycles - self.lineup_offset
+            minutes = [minute for minute in range(self.mp_cycles)
+                       if (first + minute) % length in entry_races]
+            if minutes:
+                residues.append((k, minutes))
+        return (period, residues)
+
+    def _iter_start_times(self, window):
+        """ Yields the start time of the Mini-Prix of window and of all the
+            following ones, by their count.
         """
-        info = self.mgr.get_cycle_info(next_mp.start_time)
-        # get the current MP count.
-        return info.get_event(self.name)
+        evt, count = window
+        table = self.mgr.get_occurence_table(self.name)
+        if table and evt.start_time >= table.start and table.covers(count):
+            while True:
+                yield table.get_event_times(count)[0]
+                count += 1
+        # before the table starts, walk the schedule instead
+        yield evt.start_time
+        for evt in self.mgr.iter_events(evt.start_time, [self.name]):
+            yield evt.start_time
 
-    def get_miniprix(self, timestamp=None):
-        next_mp = self.mgr.when_event(names=[self.name], timestamp=timestamp)
-        if not next_mp:
-            return None
-        cycle = self._get_mp_cycle(next_mp[0])
-        start_time = None
-        if not timestamp:
-            current = self.mgr.get_current_event()
-            if current.name == self.name:
-                # if there's an ongoing miniprix, this is the one we wanna display
-                cycle -= 1
-                start_time = current.start_time
-        else:
-            ts_evt = self.mgr.get_event(timestamp)
-            if ts_evt.name == self.name:
-                # if the requested time falls in a miniprix, let's make sure we
-                # don't return the following time slot.
-                cycle -= 1
-                start_time = ts_evt.start_time
-        if not start_time:
-            start_time = next_mp[0].start_time
-
-        rows = self._get_track_selection_rows(cycle)
-        mirror_rows = self._get_mirroring_rows(cycle)
-        return self.eventify_rows(start_time, rows, mirror_rows)
-
-    def eventify_rows(self, start_time, rows, mirror_rows):
-        res = []
-        for idx, row in enumerate(rows):
-            name = self.name
-            mpid = "{:03d}.{:s}".format(int(row[0]), str(mirror_rows[idx][0]))
-            mirror = mirror_rows[idx][1]
-            r1, r2, r3 = row[1].split(' > ')
-            evt = events.MiniPrixEvent(
-                    name, mpid, r1, r2, r3,
-                    start_minute=idx, end_minute=idx + 1, mirrored=mirror,
-                    schedname=self.name,
-                )
-            evt.set_start_time(start_time + timedelta(minutes=idx))
-            res.append(evt)
-        return res
+    def iter_track(self, track, timestamp=None, until=None, mirrored=None):
+        """ Yields the Mini-Prix races on track, from the ongoing or next
+            Mini-Prix, in order. Stops after 'until' if it is set.
+            Only the Mini-Prix numbers that can race on track are looked
+            up, their start time comes from the cycle manager's
+            OccurenceTable.
+        """
+        timestamp = timestamp or datetime.now(timezone.utc)
+        window = self.mgr.resolve_window(self.name, timestamp)
+        if not window or not self.mp_cycles:
+            return
+        period, residues = self._get_track_residues(track, mirrored)
+        if not residues:
+            return
+        first_count = window[1]
+        start_times = self._iter_start_times(window)
+        seen = first_count
+        start_time = next(start_times)
+        base = first_count - first_count % period
+        now_minute = schedule.cptime(timestamp)
+        while True:
+            for k, minutes in residues:
+                count = base + k
+                if count < first_count:
+                    continue
+                while seen < count:
+                    start_time = next(start_times)
+                    seen += 1
+                first = count * self.mp_cycles - self.lineup_offset
+                for minute in minutes:
+                    evt_start = start_time + timedelta(minutes=minute)
+                    if until is not None and evt_start > until:
+                        return
+                    if evt_start < now_minute:
+                        # already over
+                        continue
+                    lineup = self._ring.get(first + minute)
+                    evt = _eventify_lineups(self.name, evt_start, [lineup])[0]
+                    yield evt
+            base += period
+
+    def eventify_lineups(self, start_time, lineups):
+        return _eventify_lineups(self.name, start_time, lineups)
 
 
 class PrivateMPManager(object):
@@ -147,6 +276,11 @@ class PrivateMPManager(object):
         Supplied with a public MP manager, since the public MP selection will
         override Private MP if it is running concurrently.
         Therefore a public MP manager must be initialized first.
+        Private lobby lineups change every minute. They are kept in a table
+        with one entry per minute, public Mini-Prix lineups included, that
+        covers the day ahead and is extended as time moves on.
+        The table is replaced rather than changed in place, so that queries
+        running on other threads keep reading a consistent one.
     """
     def __init__(self, event_name, cycle_manager, public_mp_manager, mirror_manager=None):
         super().__init__()
@@ -156,47 +290,141 @@ class PrivateMPManager(object):
         self.mirror_mgr = mirror_manager
         # how many result rows (or minutes) to look up
         self._lookup_count = PMP_CYCLES
+        # (start time, lineups for each minute from start)
+        self._table = (None, ())
+        self._table_lock = threading.Lock()
 
-    def _get_rows_from_event(self, evts):
-        if evts:
-            return [(evt.start_minute, evt.name) for evt in evts]
-        return [(0, "000")] * (self._lookup_count + 1)
-
-    def get_miniprix(self, timestamp=None):
-        # get private mp schedule data
-        evts = self.mgr.list_events(timestamp, next=self._lookup_count)
+    def _build_lineups(self, start, minutes):
+        """ Lineups for each minute from start, as LineupRing entries.
+            Public Mini-Prix lineups replace private ones.
+        """
+        from_time = start - timedelta(minutes=1)
+        until = start + timedelta(minutes=minutes - 1)
+        evts = list(self.mgr.iter_events(from_time, until=until))
         if self.mirror_mgr:
-            mirror_evts = self.mirror_mgr.list_events(timestamp, next=self._lookup_count)
+            mirror_evts = self.mirror_mgr.iter_events(from_time, until=until)
+            mirror_rows = [(evt.start_minute, evt.name) for evt in mirror_evts]
         else:
-            mirror_evts = []
-
-        # prepare private mp events
-        start_time = evts[0].start_time
-        rows = self._get_rows_from_event(evts)
-        mirror_rows = self._get_rows_from_event(mirror_evts)
-        mps = self.eventify_rows(start_time, rows, mirror_rows)
-
-        # look up any clashing public mp
-        pub_mp = self.pmp_mgr.get_miniprix(timestamp)
-        start_times = dict([(evt.start_time, evt) for evt in pub_mp])
-        for idx in range(len(mps)):
-            if mps[idx].start_time in start_times:
-                # replace this mp event with the public event track selection for that time.
-                mps[idx] = start_times[mps[idx].start_time]
-        return mps
-
-    def eventify_rows(self, start_time, rows, mirror_rows):
-        res = []
-        for idx, row in enumerate(rows):
-            name = self.name
-            mpid = "{:03d}.{:s}".format(int(row[0]) + 1, str(mirror_rows[idx][0]))
-            mirror = mirror_rows[idx][1]
-            r1, r2, r3 = row[1].split(' > ')
-            evt = events.MiniPrixEvent(
-                    name, mpid, r1, r2, r3,
-                    start_minute=idx, end_minute=idx + 1, mirrored=mirror,
-                    schedname=self.name,
-                )
-            evt.set_start_time(start_time + timedelta(minutes=idx))
-            res.append(evt)
-        return res
+            mirror_rows = [(0, "000")] * len(evts)
+        lineups = []
+        for evt, (mirror_id, mirror) in zip(evts, mirror_rows):
+            mpid = "{:03d}.{:s}".format(int(evt.start_minute) + 1, str(mirror_id))
+            lineups.append((mpid, parse_lineup(evt.name), mirror))
+
+        # look up any clashing public mp, including one already started
+        end = start + timedelta(minutes=minutes)
+        timestamp = start
+        while True:
+            window = self.pmp_mgr.mgr.resolve_window(self.pmp_mgr.name, timestamp, limit=minutes)
+            if not window or window[0].start_time >= end:
+                break
+            mp_evt, cycle = window
+            first = (mp_evt.start_time - start) // timedelta(minutes=1)
+            for idx, lineup in enumerate(self.pmp_mgr._iter_lineups(cycle)):
+                if 0 <= first + idx < len(lineups):
+                    lineups[first + idx] = lineup
+            timestamp = mp_evt.end_time
+        return lineups
+
+    @staticmethod
+    def _get_passed(table, now):
+        """ Minutes from the table start to now, or None if the table
+            does not cover the day ahead of now.
+        """
+        start, lineups = table
+        if start is None:
+            return None
+        passed = (now - start) // timedelta(minutes=1)
+        if not 0 <= passed <= len(lineups):
+            return None
+        if len(lineups) - passed <= PMP_TABLE_MINUTES - PMP_TABLE_STEP:
+            return None
+        return passed
+
+    def _update_table(self, now):
+        """ Returns the table, a (start time, lineups) tuple, covering the
+            day ahead of now. Lineups already in the table are kept, only
+            later minutes are built.
+        """
+        table = self._table
+        if self._get_passed(table, now) is not None:
+            return table
+        with self._table_lock:
+            # another thread may have updated it meanwhile
+            table = self._table
+            if self._get_passed(table, now) is not None:
+                return table
+            start, lineups = table
+            passed = None
+            if start is not None:
+                passed = (now - start) // timedelta(minutes=1)
+            if passed is None or not 0 <= passed <= len(lineups):
+                lineups = tuple(self._build_lineups(now, PMP_TABLE_MINUTES))
+            else:
+                lineups = lineups[passed:]
+                table_end = now + timedelta(minutes=len(lineups))
+                lineups += tuple(self._build_lineups(table_end, PMP_TABLE_MINUTES - len(lineups)))
+            self._table = (now, lineups)
+            return self._table
+
+    def _get_lineups(self, start, count, now):
+        """ count lineups from start, sliced from the table if it has them.
+        """
+        table_start, lineups = self._update_table(now)
+        first = (start - table_start) // timedelta(minutes=1)
+        if 0 <= first and first + count <= len(lineups):
+            return list(lineups[first:first + count])
+        return self._build_lineups(start, count)
+
+    def _iter_private_track(self, track, timestamp, mirrored):
+        """ Yields the private lobby races on track after timestamp, public
+            Mini-Prix minutes left out.
+        """
+        names = [name for name in self.mgr.rotation_data.names
+                 if track in parse_lineup(name)]
+        if not names:
+            return
+        while True:
+            found = self.mgr.when_event(names, count=PMP_TRACK_BATCH, timestamp=timestamp)
+            if not found:
+                return
+            for evt in found:
+                start = evt.start_time
+                if self.pmp_mgr.mgr.get_event_name(start) == self.pmp_mgr.name:
+                    continue
+                tracks = parse_lineup(evt.name)
+                mirror_id, mirror = (0, "000")
+                if self.mirror_mgr:
+                    mirror_evt = self.mirror_mgr.get_event(start)
+                    mirror_id, mirror = (mirror_evt.start_minute, mirror_evt.name)
+                if mirrored is not None:
+                    flags = [flag == '1' for name, flag in zip(tracks, mirror) if name == track]
+                    if mirrored not in flags:
+                        continue
+                mpid = "{:03d}.{:s}".format(int(evt.start_minute) + 1, str(mirror_id))
+                yield _eventify_lineups(self.name, start, [(mpid, tracks, mirror)])[0]
+            timestamp = found[-1].start_time
+
+    def iter_track(self, track, timestamp=None, until=None, mirrored=None):
+        """ Yields the private lobby races on track from the timestamp
+            minute, in order, including those of public Mini-Prix.
+            Stops after 'until' if it is set.
+        """
+        timestamp = schedule.cptime(timestamp or datetime.now(timezone.utc))
+        private = self._iter_private_track(track, timestamp - timedelta(minutes=1), mirrored)
+        public = self.pmp_mgr.iter_track(track, timestamp, until, mirrored)
+        for evt in heapq.merge(private, public, key=lambda evt: evt.start_time):
+            if until is not None and evt.start_time > until:
+                return
+            yield evt
+
+    def get_miniprix(self, timestamp=None):
+        now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        start = now
+        if timestamp:
+            start = timestamp.replace(second=0, microsecond=0)
+        lineups = self._get_lineups(start, self._lookup_count + 1, now)
+        return self.eventify_lineups(start, lineups)
+
+    def eventify_lineups(self, start_time, lineups):
+        return _eventify_lineups(self.name, start_time, lineups)
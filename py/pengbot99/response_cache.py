@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+
+import collections
+import threading
+
+# local imports
+from pengbot99 import formatters
+
+
+# How many responses are kept, least recently used ones are dropped first.
+CACHE_SIZE = 256
+# Expiry for responses that never change.
+NEVER = datetime.max.replace(tzinfo=timezone.utc)
+
+
+def get_expiry(boundary, times, now):
+    """ A rendered response is valid until boundary, the next event
+        boundary that changes it (None if there is none), or until one of
+        its timestamps is displayed differently.
+    """
+    expires = boundary or NEVER
+    for dt in times:
+        change = formatters.get_timestamp_change(dt, now)
+        if change and change < expires:
+            expires = change
+    return expires
+
+
+def get_list_boundary(evts, minutes):
+    """ When a list of the events of the next 'minutes' minutes, starting
+        with the ongoing one, changes: the ongoing event ends, or the event
+        after the last one listed comes within reach.
+        None if the list is empty.
+    """
+    if not evts:
+        return None
+    return min(evts[0].end_time, evts[-1].end_time - timedelta(minutes=minutes))
+
+
+class ResponseCache(object):
+    """ Computed event lists and rendered messages, by query kind and
+        arguments. Times in arguments are not truncated here, callers pass
+        minute precision times (e.g. parsed from 'YYYY-MM-DD HH:MM') so that
+        each key covers a minute.
+        Each entry is kept until the next event boundary that changes it,
+        rather than for a fixed time, so that repeated queries between
+        boundaries are served from memory.
+    """
+    def __init__(self, size=CACHE_SIZE):
+        super().__init__()
+        self.size = size
+        # key: (value, expiry time)
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # responses are looked up from commands and from the board refresh
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, kind, args, compute_fn, now=None):
+        """ Returns the value cached for kind and args, or computes it.
+            compute_fn returns a (value, expiry time) tuple. The value is
+            not kept if the expiry time is None.
+        """
+        now = now or datetime.now(timezone.utc)
+        key = (kind, args)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now < entry[1]:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value, expires = compute_fn()
+        with self._lock:
+            if expires is None or expires <= now:
+                self._entries.pop(key, None)
+                return value
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
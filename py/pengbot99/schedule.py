@@ -1,10 +1,24 @@
+from array import array
 from datetime import datetime, timedelta, timezone
 
 import abc
+import bisect
 import csv
+import heapq
+import itertools
+import math
+import sys
+import threading
+
+try:
+    import numpy
+except ImportError:
+    # batch queries fall back to pure Python
+    numpy = None
 
 # local imports
 from pengbot99 import events
+from pengbot99 import secret_league
 
 
 # This should mark a cycle origin in UTC time
@@ -16,6 +30,49 @@ glitch_origin = datetime(2025, 12, 8, 22, 57, tzinfo=timezone.utc)
 # A point observed to be a Mystery GP sequence origin.
 glitch_gp_origin = datetime(2026, 1, 18, 22, 0, tzinfo=timezone.utc)
 
+# A Monday at 00:00 UTC, used as reference to count weekday/weekend minutes.
+week_origin = datetime(2024, 1, 1, 0, 0, tzinfo=timezone.utc)
+# Cumulative (weekday, weekend) minutes at the start of each day of the week,
+# from Monday (0) to Sunday (6).
+WEEK_DAY_MINUTES = (
+        (0, 0), (1440, 0), (2880, 0), (4320, 0), (5760, 0), (7200, 0), (7200, 1440),
+    )
+WEEK_MINUTES = 7 * 24 * 60
+# Reference for batch queries, which count minutes since the Unix epoch.
+epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class Interner(object):
+    """ Gives each distinct item a small integer ID, in order of first use.
+        Items must be hashable.
+    """
+    def __init__(self):
+        super().__init__()
+        self.ids = {}
+        self.items = []
+        # schedules may be loaded from several threads
+        self._lock = threading.Lock()
+
+    def intern(self, item):
+        """ Returns the ID for item, creating one if needed.
+        """
+        item_id = self.ids.get(item)
+        if item_id is None:
+            with self._lock:
+                item_id = self.ids.get(item)
+                if item_id is None:
+                    self.items.append(item)
+                    item_id = self.ids[item] = len(self.items) - 1
+        return item_id
+
+    def __getitem__(self, item_id):
+        return self.items[item_id]
+
+
+# Rotations, interned as schedules are loaded. The engine works with
+# rotation IDs, rotation tuples are only used to build events.
+rotation_ids = Interner()
+
 
 def load_schedule(path, name):
     """ Loads a CSV schedule from the folder 'path' and the file
@@ -36,13 +93,40 @@ def load_schedule(path, name):
         for row in reader:
             try:
                 minutes = int(row[0])
-                rotation = [minutes] + [str(item) for item in row[1:]]
-                schedule.append(tuple(rotation))
+                schedule.append(tuple([minutes] + [str(item) for item in row[1:]]))
             except Exception as e:
                 #TODO: better validation
                 raise
     assert schedule[-1][1] == "next", "Must end with next"
-    return schedule
+    return intern_schedule(schedule)
+
+
+def intern_schedule(schedule):
+    """ Interns the rotations of schedule rows, and returns the rows with
+        the same event name always being the same string object.
+    """
+    rows = []
+    for row in schedule:
+        rotation = tuple(sys.intern(item) for item in row[1:])
+        rotation_ids.intern(rotation)
+        rows.append((row[0],) + rotation)
+    return rows
+
+
+def minutes_by_day_type(timestamp):
+    """ How many weekday minutes, and weekend minutes, passed between
+        week_origin and the given timestamp.
+        The result is returned as a tuple of 2 ints.
+    """
+    minutes = (timestamp - week_origin) // timedelta(minutes=1)
+    weeks, week_minute = divmod(minutes, WEEK_MINUTES)
+    day, day_minute = divmod(week_minute, 24 * 60)
+    wd_minutes, we_minutes = WEEK_DAY_MINUTES[day]
+    if day < 5:
+        wd_minutes += day_minute
+    else:
+        we_minutes += day_minute
+    return (weeks * 5 * 24 * 60 + wd_minutes, weeks * 2 * 24 * 60 + we_minutes)
 
 
 def cptime(dt):
@@ -61,103 +145,109 @@ class CycleInfo(object):
         super().__init__()
         # A counter for the total number of any cycle
         cycle_id = 0
-        self._rotations = {}
-        self._events = {}
+        # rotation counts by rotation ID
+        self._rotations = dict.fromkeys(data.rotations, 0)
         # Iterate over time tables
         for tt_key in data:
             # Look up how many times this timetable cycled
             tt_cycles = count.get(tt_key, 0)
             cycle_id += tt_cycles
-            # Every unique rotation in this timetable
-            for rot_key in data[tt_key]:
-                # How many times the rotation occurs
-                key_count = data[tt_key][rot_key]
-                if self._rotations.get(rot_key):
-                    # This rotation appears in other timetables
-                    self._rotations[rot_key] += tt_cycles * key_count
-                else:
-                    self._rotations[rot_key] = tt_cycles * key_count
+            if not tt_cycles:
+                continue
+            # Every unique rotation in this timetable and how many times
+            # it occurs in one cycle
+            for rot_key, key_count in data[tt_key].items():
+                self._rotations[rot_key] += tt_cycles * key_count
         self.id = cycle_id
         self.minute = minute
         self.schedule = sched
-        self._build_event_count()
+        self._count = count
+        self._data = data
         if self.minute > 0:
-            self._offset_event_count()
-
-    def _build_event_count(self):
-        """ How many of each known event already occured.
-        """
-        for rotation in self._rotations:
-            # how many complete rotations happened
-            full_rots = self._rotations[rotation] // len(rotation)
-            # if we are part-way through a rotation, at which index are we?
-            cur_rot = self._rotations[rotation] % len(rotation)
-            # the list of unique events in this rotation
-            unique_evts = list(set(rotation))
-            for evt_name in unique_evts:
-                # how many of this event in a full rotation
-                full_count = rotation.count(evt_name)
-                if cur_rot:
-                    # how many events have happened as part of the current rotation
-                    cur_count = rotation[:cur_rot].count(evt_name)
-                else:
-                    cur_count = 0
-                # tally this event's occurences from this rotation
-                evt_count = full_rots * full_count + cur_count
-                if evt_name in self._events:
-                    # we have seen this event in another rotation
-                    self._events[evt_name] += evt_count
-                else:
-                    # we have not seen this event yet
-                    self._events[evt_name] = evt_count
+            self._offset_rotation_count()
 
-    def _offset_event_count(self):
-        """ If this cycle is in progress, what does it mean for the event count?
+    def _offset_rotation_count(self):
+        """ If this cycle is in progress, count the rotations that already
+            occured in it.
         """
-        cycle_rots = self.schedule.get_rotations_until(self.minute)
-        for rot in set(cycle_rots):
-            # how many times did this rotation show up in this cycle?
-            count = cycle_rots.count(rot)
-            # current index for this rotation at cycle start
-            idx = self._rotations[rot] % len(rot)
-            for n in range(count):
-                evt_name = rot[(idx + n) % len(rot)]
-                self._events[evt_name] += 1
-            # then we need to update the rotation count
-            self._rotations[rot] += count
+        for rot_id, count in self.schedule.get_rotation_ids_before(self.minute).items():
+            self._rotations[rot_id] += count
 
-    def get_rotation(self, evts):
-        """ Returns the number of occurences of this rotation of events
+    def get_next_cycle(self, sched):
+        """ Returns a CycleInfo for the start of the cycle following this one,
+            which runs the 'sched' time table.
         """
-        return self._rotations.get(tuple(evts)) or self.id
+        count = dict(self._count)
+        count[self.schedule.name] = count.get(self.schedule.name, 0) + 1
+        return CycleInfo(sched, count, self._data, 0)
+
+    def get_rotation(self, rot_id):
+        """ Returns the number of occurences of this rotation of events,
+            given as a rotation ID.
+        """
+        return self._rotations.get(rot_id) or self.id
 
     def get_event(self, evt):
         """ Returns the number of occurences of this event across all rotations
         """
-        return self._events.get(str(evt)) or 0
+        total = 0
+        for rot_id, rot_len, full_count, partial_counts in self._data.events.get(str(evt), ()):
+            occurences = self._rotations[rot_id]
+            # complete rotations, then the part-way one if any
+            total += occurences // rot_len * full_count
+            total += partial_counts[occurences % rot_len]
+        return total
 
     def find_rotation(self, evts):
         """ Given a list of event name, returns the first rotation that
             contains any event with such name. Only one name in 'evt' needs to
             match.
         """
-        for rot in self._rotations:
+        for rot_id in self._rotations:
+            rot = rotation_ids[rot_id]
             for name in evts:
                 if name in rot:
                     return rot
         return None
 
 
+class RotationData(dict):
+    """ Maps each time table to its rotation IDs and their count per cycle.
+        It also holds, for each event name, the rotations it appears in with
+        how many times it occurs in a full rotation and in a partial one.
+    """
+    def __init__(self, timetables):
+        super().__init__()
+        # every unique rotation ID, in time table order
+        self.rotations = []
+        tt_idx = 0
+        for tt in timetables:
+            if tt.name:
+                key = tt.name
+            else:
+                key = tt_idx
+                tt_idx += 1
+            self[key] = tt.get_rotation_ids()
+            for rot_id in self[key]:
+                if rot_id not in self.rotations:
+                    self.rotations.append(rot_id)
+        self.events = {}
+        # every unique event name, in rotation order. A name's position in
+        # this list is its code in batch query results.
+        self.names = []
+        for rot_id in self.rotations:
+            rot = rotation_ids[rot_id]
+            for name in dict.fromkeys(rot):
+                if name not in self.events:
+                    self.names.append(name)
+                # occurences of the event in the first n items of the rotation
+                partial_counts = [rot[:n].count(name) for n in range(len(rot))]
+                entry = (rot_id, len(rot), rot.count(name), partial_counts)
+                self.events.setdefault(name, []).append(entry)
+
+
 def build_rotation_data(timetables):
-    res = {}
-    tt_idx = 0
-    for tt in timetables:
-        if tt.name:
-            res[tt.name] = tt.get_rotations()
-        else:
-            res[tt_idx] = tt.get_rotations()
-            tt_idx += 1
-    return res
+    return RotationData(timetables)
 
 
 class TimeTable(object):
@@ -170,26 +260,59 @@ class TimeTable(object):
         self.name = name
         self._data = data
         self.duration = data[-1][0]
+        self._compile()
+
+    def _compile(self):
+        """ Builds lookup tables from the schedule rows once, so that
+            queries do not need to scan (or copy) rows.
+        """
+        # start minute of each row, ordered as in the schedule file
+        self._starts = [row[0] for row in self._data]
+        # each row's rotation, created once and shared by all queries
+        self._rotations = [tuple(row[1:]) for row in self._data]
+        # and its interned ID, used for rotation counts
+        self._rot_ids = [rotation_ids.intern(rot) for rot in self._rotations]
+        # index of the active row for each minute of the cycle,
+        # or -1 if no row has started yet at that minute.
+        self._minute_index = [
+                bisect.bisect_right(self._starts, minute) - 1
+                for minute in range(self.duration)
+            ]
+        # how many rows started strictly before each minute of the cycle
+        self._started_index = [
+                bisect.bisect_left(self._starts, minute)
+                for minute in range(self.duration)
+            ]
+        # rotation IDs and how many times they occur in one cycle
+        self._cycle_rotations = {}
+        # rotation IDs that occured before each row, used for in-progress cycles
+        self._rotations_before = [{}]
+        for rot_id in self._rot_ids[:-1]:
+            self._cycle_rotations[rot_id] = self._cycle_rotations.get(rot_id, 0) + 1
+            self._rotations_before.append(dict(self._cycle_rotations))
+
+    def _get_row_index(self, minute):
+        """ Index of the last row starting at or before minute.
+        """
+        if 0 <= minute < self.duration:
+            return self._minute_index[minute]
+        return bisect.bisect_right(self._starts, minute) - 1
 
     def _get_active_row(self, minute):
-        active_row = []
-        for row in self._data:
-            if row[0] <= minute:
-                active_row = row[:]
-            # we could break here if row[0] > cycle_minute
-            # but assuming the schedule is ordered.
-        return active_row
+        idx = self._get_row_index(minute)
+        if idx < 0:
+            return []
+        return self._data[idx]
 
     def _get_next_row(self, minute):
-        next_row = []
-        for row in self._data:
-            if row[0] > minute:
-                next_row = row[:]
-                break
-        return next_row
+        idx = self._get_row_index(minute) + 1
+        if idx >= len(self._data):
+            return []
+        return self._data[idx]
 
-    def get_event(self, cycle_info):
-        """ What event is on at specified cycle and minute
+    def get_event(self, cycle_info, cycle_start=None):
+        """ What event is on at specified cycle and minute.
+            If cycle_start is given, the event's start time is set from it.
 
             Because this is within the schedule, we need info supplied
             by CycleInfo objects to calculate the state of rotations.
@@ -199,12 +322,11 @@ class TimeTable(object):
             relation between CycleInfo and TimeTable, which should
             instead both be accessed by a manager class.
         """
-        active_row = self._get_active_row(cycle_info.minute)
-        if active_row:
-            # trim time entry
-            start_minute = active_row[0]
-            active_row = active_row[1:]
-            cycle = cycle_info.get_rotation(active_row)
+        idx = self._get_row_index(cycle_info.minute)
+        if idx >= 0:
+            start_minute = self._starts[idx]
+            active_row = self._rotations[idx]
+            cycle = cycle_info.get_rotation(self._rot_ids[idx])
             if cycle_info.minute > start_minute:
                 # the rotation for the current event was already counted
                 rot_count = -1
@@ -213,17 +335,19 @@ class TimeTable(object):
                 rot_count = 0
             rotation_index = (cycle + rot_count) % len(active_row)
             name = active_row[rotation_index]
-            next_row = self._get_next_row(cycle_info.minute)
-            if next_row:
-                end_minute = next_row[0]
+            if idx + 1 < len(self._starts):
+                end_minute = self._starts[idx + 1]
             else:
                 # likely not needed
                 end_minute = start_minute
+            start_time = None
+            if cycle_start is not None:
+                start_time = cycle_start + timedelta(minutes=start_minute)
             return events.Event(
                     name=name, cycle=cycle, cycle_minute=cycle_info.minute,
                     start_minute=start_minute, end_minute=end_minute,
                     rotation=active_row, rotation_offset=rotation_index,
-                    schedname=self.name,
+                    schedname=self.name, start_time=start_time,
                 )
         else:
             return ''
@@ -238,80 +362,530 @@ class TimeTable(object):
         else:
             return -1
 
-    def get_remaining_events(self, cycle_info, all=False, filter=None):
+    def get_remaining_events(self, cycle_info, all=False, filter=None, cycle_start=None):
         """ Returns a list of events in the cycle that have yet
             to start.
         """
+        return list(self.iter_remaining_events(cycle_info, all, filter, cycle_start))
+
+    def iter_remaining_events(self, cycle_info, all=False, filter=None, cycle_start=None):
+        """ Yields the events in the cycle that have yet to start,
+            the last one being the 'next' event. If cycle_start is given,
+            event start times are set from it.
+        """
         minute = cycle_info.minute
         if all:
             # ignore the cycle minute to return every event
             minute = -1
-        idx = 0
-        evts = []
+        # rows starting before the cycle minute are already accounted for
+        idx = bisect.bisect_left(self._starts, minute)
         # rot_counts is used to keep track of rotations we visited, so that we
         # calculate the correct rotation offset if a rotation appears more than
         # once in remaining events
         rots_count = {}
         while idx < len(self._data):
-            row = self._data[idx]
-            rotation = row[1:]
-            if row[0] > minute:
-                start_minute = row[0]
-                cycle = cycle_info.get_rotation(rotation) + rots_count.get(rotation, 0)
+            start_minute = self._starts[idx]
+            rotation = self._rotations[idx]
+            rot_id = self._rot_ids[idx]
+            if start_minute > minute:
+                cycle = cycle_info.get_rotation(rot_id) + rots_count.get(rot_id, 0)
                 rotation_index = cycle % len(rotation)
-                current = row[1:][rotation_index]
+                current = rotation[rotation_index]
                 if not filter or current in filter or current == 'next':
                     if current != "next":
-                        end_minute = self._data[idx + 1][0]
+                        end_minute = self._starts[idx + 1]
                     else:
                         end_minute = start_minute
-                    evts.append(events.Event(
+                    start_time = None
+                    if cycle_start is not None:
+                        start_time = cycle_start + timedelta(minutes=start_minute)
+                    yield events.Event(
                             name=current, cycle=cycle, cycle_minute=cycle_info.minute,
                             start_minute=start_minute, end_minute=end_minute,
                             rotation=rotation, rotation_offset=rotation_index,
-                            schedname=self.name,
-                        ))
-            if row[0] >= minute:
+                            schedname=self.name, start_time=start_time,
+                        )
+            if start_minute >= minute:
                 # using greater-equal comparison here lets us catch the current event's
                 # rotation in case it's relevant to our offset.
-                if rotation not in rots_count:
-                    rots_count[rotation] = 1
+                if rot_id not in rots_count:
+                    rots_count[rot_id] = 1
                 else:
-                    rots_count[rotation] += 1
+                    rots_count[rot_id] += 1
             idx += 1
-        return evts
 
     def get_rotations(self, name=None):
         """ Returns a dict of rotations with their count.
             Optionally, rotations can be filtered on a specific event name.
             In this case, only rotations including the event will be returned.
         """
-        rotations = {}
-        for row in self._data[:-1]:
-            t_row = tuple(row[1:])
-            if name and name not in t_row:
-                continue
-            if t_row in rotations:
-                rotations[t_row] += 1
-            else:
-                rotations[t_row] = 1
-        return rotations
+        rotations = dict(
+                (rotation_ids[rot_id], count) for rot_id, count in self._cycle_rotations.items()
+            )
+        if not name:
+            return rotations
+        return dict((rot, count) for rot, count in rotations.items() if name in rot)
+
+    def get_rotation_ids(self):
+        """ Returns a dict of rotation IDs with their count.
+        """
+        return dict(self._cycle_rotations)
 
     def get_rotations_until(self, minute):
         """ Returns a list of rotations that occur before the given minute in
             the current cycle.
         """
-        rotations = []
-        start_minute = 0
-        for row in self._data:
-            start_minute = row[0]
-            # capture past events and in-progress events
-            # but not one that's immediately starting.
-            if start_minute < minute and row[1] != 'next':
-                rotations.append(row[1:])
-            else:
+        # capture past events and in-progress events
+        # but not one that's immediately starting.
+        last = bisect.bisect_left(self._starts, minute)
+        return [rot for rot in self._rotations[:last] if rot[0] != 'next']
+
+    def get_rotations_before(self, minute):
+        """ Returns a dict of rotations with their count, for the events
+            started before the given minute in the current cycle.
+        """
+        rotations = self.get_rotation_ids_before(minute)
+        return dict((rotation_ids[rot_id], count) for rot_id, count in rotations.items())
+
+    def get_rotation_ids_before(self, minute):
+        """ Same as get_rotations_before, with rotation IDs as keys.
+            The returned dict is shared and must not be modified.
+        """
+        if 0 <= minute < self.duration:
+            started = self._started_index[minute]
+        else:
+            started = bisect.bisect_left(self._starts, minute)
+        # the 'next' row is never counted
+        started = min(started, len(self._rotations_before) - 1)
+        return self._rotations_before[started]
+
+
+def solve_congruence(a, b, m):
+    """ Solves a * k = b (modulo m) for k.
+        Returns a (k, period) tuple where k is the smallest non-negative
+        solution and all solutions are k plus a multiple of period.
+        Returns None if there is no solution.
+    """
+    gcd = math.gcd(a, m)
+    if b % gcd:
+        return None
+    period = m // gcd
+    if period == 1:
+        return (0, 1)
+    k = (b // gcd) * pow(a // gcd, -1, period) % period
+    return (k, period)
+
+
+class EventIndex(object):
+    """ An inverted index from event names to the events of a repeating
+        time frame.
+        Each event of the first frame is recorded as a slot, with its
+        rotation counter. In frame k, the counter for the same slot is moved
+        on by k times the rotation's count per frame, so the frames in which
+        the slot has a given event name follow from modular arithmetic.
+    """
+    def __init__(self, mgr, start, minutes):
+        super().__init__()
+        self.start = start
+        self.minutes = minutes
+        end = start + timedelta(minutes=minutes)
+        # rotation counters move on by this much for each frame
+        self._deltas = mgr.get_frame_deltas(start, minutes)
+        # events starting from the frame start, up until the frame end,
+        # with their rotation ID
+        self._slots = []
+        from_time = start - timedelta(minutes=1)
+        until = end - timedelta(minutes=1)
+        for evt in mgr._iter_events(from_time, until=until):
+            offset = (evt.start_time - start) // timedelta(minutes=1)
+            self._slots.append((offset, evt, rotation_ids.ids[evt.rotation]))
+        # frame occurence rules by key, built on first use
+        self._rules = {}
+        self._rules_lock = threading.Lock()
+
+    def covers(self, timestamp):
+        """ Whether timestamp is late enough to be looked up in the index.
+        """
+        return timestamp >= self.start
+
+    def get_rules(self, key, get_residues):
+        """ For each slot that can match, returns the first frame when it
+            does and how many frames until it does again.
+            get_residues is called with each slot's first event and returns
+            a (modulus, residues) tuple: the event matches when its rotation
+            counter is equal to any of the residues, modulo modulus.
+            Rules are kept under key, which must identify get_residues.
+        """
+        if key in self._rules:
+            return self._rules[key]
+        with self._rules_lock:
+            if key not in self._rules:
+                self._rules[key] = self._build_rules(get_residues)
+        return self._rules[key]
+
+    def _build_rules(self, get_residues):
+        rules = []
+        for idx, (offset, evt, rot_id) in enumerate(self._slots):
+            delta = self._deltas.get(rot_id, 0)
+            modulus, residues = get_residues(evt)
+            for residue in residues:
+                # frame k matches when (cycle + k * delta) is equal to
+                # the residue, modulo modulus.
+                solution = solve_congruence(delta, residue - evt.cycle, modulus)
+                if solution:
+                    rules.append((idx, solution[0], solution[1]))
+        return rules
+
+    def _get_name_rules(self, name):
+        """ Rules for the slots that can have this event name.
+        """
+        def get_positions(evt):
+            positions = [pos for pos, item in enumerate(evt.rotation) if item == name]
+            return len(evt.rotation), positions
+        return self.get_rules(name, get_positions)
+
+    def _create_event(self, idx, frame):
+        """ Returns the event for a slot in the given frame.
+        """
+        offset, evt, rot_id = self._slots[idx]
+        rotation = evt.rotation
+        cycle = evt.cycle + frame * self._deltas.get(rot_id, 0)
+        rotation_index = cycle % len(rotation)
+        return events.Event(
+                name=rotation[rotation_index], cycle=cycle, cycle_minute=evt.start_minute,
+                start_minute=evt.start_minute, end_minute=evt.end_minute,
+                rotation=rotation, rotation_offset=rotation_index,
+                schedname=evt.schedule_name,
+                start_time=self.start + timedelta(minutes=frame * self.minutes + offset),
+            )
+
+    def iter_occurences(self, names, timestamp):
+        """ Yields (minute, slot, frame) tuples in order, for events in names
+            starting after the timestamp minute. Minutes count from the
+            index start.
+        """
+        rules = []
+        for name in dict.fromkeys(names):
+            rules.extend(self._get_name_rules(name))
+        return self.iter_rule_occurences(rules, timestamp)
+
+    def iter_rule_occurences(self, rules, timestamp):
+        """ Same as iter_occurences, for events matching any of the rules.
+        """
+        minute = (cptime(timestamp) - self.start) // timedelta(minutes=1)
+        heap = []
+        for idx, first, period in rules:
+            offset = self._slots[idx][0]
+            # first frame when this slot starts after the timestamp
+            frame = (minute - offset) // self.minutes + 1
+            # then the first one matching the rule
+            frame += (first - frame) % period
+            heap.append((frame * self.minutes + offset, idx, frame, period))
+        heapq.heapify(heap)
+        while heap:
+            minute, idx, frame, period = heap[0]
+            yield (minute, idx, frame)
+            frame += period
+            heapq.heapreplace(heap, (frame * self.minutes + self._slots[idx][0], idx, frame, period))
+
+    def find_events(self, names, timestamp, count=1, until=None, rules=None):
+        """ Returns the next 'count' events in names starting after timestamp,
+            or all of them up to 'until' if count is zero.
+            If rules are given, events matching them are returned instead.
+        """
+        if rules is None:
+            occurences = self.iter_occurences(names, timestamp)
+        else:
+            occurences = self.iter_rule_occurences(rules, timestamp)
+        evts = []
+        for minute, idx, frame in occurences:
+            if until is not None and self.start + timedelta(minutes=minute) > until:
+                break
+            evts.append(self._create_event(idx, frame))
+            if count and len(evts) >= count:
                 break
-        return rotations
+        return evts
+
+
+class OccurenceTable(object):
+    """ The start times of the events of one name, over the run of index
+        frames after which they repeat.
+        Each run has the same number of such events, so the start time of
+        the n-th one since the schedule origin follows from a division.
+    """
+    def __init__(self, mgr, name):
+        super().__init__()
+        index = mgr.get_event_index()
+        self.start = index.start
+        frames = 1
+        for idx, first, period in index._get_name_rules(name):
+            frames = math.lcm(frames, period)
+        self.minutes = frames * index.minutes
+        until = self.start + timedelta(minutes=self.minutes - 1)
+        from_time = self.start - timedelta(minutes=1)
+        evts = index.find_events([name], from_time, count=0, until=until)
+        # start minute and duration of each event in a run
+        self._offsets = [(evt.start_time - self.start) // timedelta(minutes=1) for evt in evts]
+        self._durations = [evt.duration for evt in evts]
+        # events of that name before the first run
+        self.first_count = mgr.get_cycle_info(self.start).get_event(name)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def covers(self, count):
+        """ Whether the event with this count is in the table's runs.
+        """
+        return bool(self._offsets) and count >= self.first_count
+
+    def get_event_times(self, count):
+        """ Returns (start time, duration) for the event that had 'count'
+            events of the same name before it.
+        """
+        runs, idx = divmod(count - self.first_count, len(self._offsets))
+        minutes = runs * self.minutes + self._offsets[idx]
+        return (self.start + timedelta(minutes=minutes), self._durations[idx])
+
+
+class _ScalarOps(object):
+    """ Array operations applied to single values.
+    """
+    @staticmethod
+    def take(table, idx):
+        return table[idx]
+
+    @staticmethod
+    def where(cond, a, b):
+        return a if cond else b
+
+    @staticmethod
+    def table(items):
+        return list(items)
+
+
+class _NumpyOps(object):
+    """ Array operations applied element-wise to NumPy arrays.
+    """
+    @staticmethod
+    def take(table, idx):
+        return table[idx]
+
+    @staticmethod
+    def where(cond, a, b):
+        return numpy.where(cond, a, b)
+
+    @staticmethod
+    def table(items):
+        return numpy.array(list(items))
+
+
+def to_epoch_minutes(timestamps):
+    """ Converts timestamps to minutes since the Unix epoch.
+        timestamps can be a sequence of UTC datetimes or, when NumPy is
+        installed, an array of datetime64 in UTC.
+        Returns a NumPy array if NumPy is installed, a list otherwise.
+    """
+    if numpy is not None and isinstance(timestamps, numpy.ndarray) \
+            and numpy.issubdtype(timestamps.dtype, numpy.datetime64):
+        return timestamps.astype("datetime64[m]").astype(numpy.int64)
+    minutes = [(ts - epoch) // timedelta(minutes=1) for ts in timestamps]
+    if numpy is not None:
+        return numpy.array(minutes, dtype=numpy.int64)
+    return minutes
+
+
+class BatchEvaluator(object):
+    """ Evaluates events at many timestamps at once.
+        The time tables are flattened into lookup tables once, and the
+        cycle arithmetic of CycleInfo and TimeTable.get_event is then
+        applied to whole arrays of minutes, without creating any
+        CycleInfo or Event.
+        Each time table row gets a flat row number. An extra row, last in
+        the tables, stands for minutes when no row has started yet.
+    """
+    def __init__(self, mgr):
+        super().__init__()
+        self._mgr = mgr
+        data = mgr.rotation_data
+        timetables = mgr.get_timetables()
+        # rotations are numbered locally, in rotation data order
+        rot_idx = dict((rot_id, idx) for idx, rot_id in enumerate(data.rotations))
+        codes = dict((name, idx) for idx, name in enumerate(data.names))
+        # the extra rotation, for the extra row, has one unknown event
+        empty_rot = len(data.rotations)
+        # rotation items as name codes, and where each rotation begins
+        self.rot_items = []
+        self.rot_first = []
+        self.rot_len = []
+        for rot in [rotation_ids[rot_id] for rot_id in data.rotations] + [(None,)]:
+            self.rot_first.append(len(self.rot_items))
+            self.rot_len.append(len(rot))
+            self.rot_items.extend(codes.get(name, -1) for name in rot)
+        # how many times each rotation occurs in one cycle of each time table
+        self.cycle_rots = []
+        for tt in timetables:
+            per_cycle = [0] * (empty_rot + 1)
+            for rot_id, count in tt.get_rotation_ids().items():
+                per_cycle[rot_idx[rot_id]] = count
+            self.cycle_rots.append(per_cycle)
+        # row start minute, rotation, and occurences of the rotation in
+        # earlier rows of the cycle
+        self.row_start = []
+        self.row_rot = []
+        self.row_prior = []
+        # flat row active at each minute of each time table's cycle,
+        # each time table's minutes starting at its tt_first entry
+        self.minute_row = []
+        self.tt_first = []
+        for tt in timetables:
+            first_row = len(self.row_start)
+            prior = {}
+            for start, rot_id in zip(tt._starts[:-1], tt._rot_ids[:-1]):
+                self.row_start.append(start)
+                self.row_rot.append(rot_idx[rot_id])
+                self.row_prior.append(prior.get(rot_id, 0))
+                prior[rot_id] = prior.get(rot_id, 0) + 1
+            self.tt_first.append(len(self.minute_row))
+            self.minute_row.extend(
+                    first_row + idx if idx >= 0 else -1 for idx in tt._minute_index
+                )
+        self.row_start.append(0)
+        self.row_rot.append(empty_rot)
+        self.row_prior.append(0)
+        self._arrays = None
+
+    def _get_tables(self, ops):
+        """ Lookup tables for ops, as lists or as NumPy arrays.
+        """
+        if ops is _ScalarOps:
+            return self
+        if self._arrays is None:
+            self._arrays = BatchTables(self)
+        return self._arrays
+
+    def evaluate(self, minutes, ops):
+        """ Returns the event name codes, start minutes and rotation offsets
+            for minutes since the Unix epoch. Names that are not in any
+            rotation have code -1.
+            minutes is an int with _ScalarOps, an array with _NumpyOps.
+        """
+        return self._evaluate(minutes, ops)[:3]
+
+    def _evaluate(self, minutes, ops):
+        """ Same as evaluate, also returning the rotation counts and the
+            time table index, for Secret League marking.
+        """
+        tables = self._get_tables(ops)
+        take = ops.take
+        tt, cycles, cycle_minute = self._mgr._get_batch_cycles(minutes, ops)
+        row = take(tables.minute_row, take(tables.tt_first, tt) + cycle_minute)
+        start = take(tables.row_start, row)
+        rot = take(tables.row_rot, row)
+        # occurences of the row's rotation before the row, which is the
+        # event cycle as reported by get_remaining_events
+        rot_count = take(tables.row_prior, row)
+        for tt_cycles, per_cycle in zip(cycles, tables.cycle_rots):
+            rot_count = rot_count + tt_cycles * take(per_cycle, rot)
+        # rotations that never occured yet fall back to the cycle count
+        rot_count = ops.where((rot_count == 0) & (cycle_minute == start), sum(cycles), rot_count)
+        offset = rot_count % take(tables.rot_len, rot)
+        code = take(tables.rot_items, take(tables.rot_first, rot) + offset)
+        start_minute = minutes - (cycle_minute - start)
+        return code, start_minute, offset, rot_count, tt
+
+    def get_events_at(self, timestamps):
+        """ See BaseScheduleManager.get_events_at
+        """
+        minutes = to_epoch_minutes(timestamps)
+        if numpy is not None:
+            return self.evaluate(minutes, _NumpyOps)
+        codes, starts, offsets = array('q'), array('q'), array('q')
+        for minute in minutes:
+            code, start, offset = self.evaluate(minute, _ScalarOps)
+            codes.append(code)
+            starts.append(start)
+            offsets.append(offset)
+        return codes, starts, offsets
+
+
+class BatchTables(object):
+    """ A BatchEvaluator's lookup tables as NumPy arrays.
+    """
+    def __init__(self, evaluator):
+        super().__init__()
+        for key in ("rot_items", "rot_first", "rot_len", "row_start", "row_rot",
+                    "row_prior", "minute_row", "tt_first"):
+            setattr(self, key, numpy.array(getattr(evaluator, key), dtype=numpy.int64))
+        self.cycle_rots = [numpy.array(per_cycle, dtype=numpy.int64)
+                           for per_cycle in evaluator.cycle_rots]
+
+
+class Timeline(object):
+    """ The events of a full schedule period, as one event name code per
+        minute. Minutes count from the period start, and the period repeats
+        itself forever after that, so looking up any later time is a single
+        index operation.
+        codes can be an array, or a memoryview on shared memory.
+    """
+    def __init__(self, start, minutes, names, codes):
+        super().__init__()
+        self.start = start
+        self.minutes = minutes
+        self.names = names
+        self.codes = codes
+
+    @staticmethod
+    def get_typecode(names):
+        """ The smallest array typecode for codes of these names, keeping
+            room for a few names added by marking.
+        """
+        if len(names) < 120:
+            return 'b'
+        return 'h'
+
+    @property
+    def typecode(self):
+        if isinstance(self.codes, memoryview):
+            return self.codes.format
+        return self.codes.typecode
+
+    @property
+    def nbytes(self):
+        return len(self.codes) * self.codes.itemsize
+
+    def covers(self, timestamp):
+        """ Whether timestamp is late enough to be looked up in the timeline.
+        """
+        return timestamp >= self.start
+
+    def get_code(self, timestamp):
+        minute = (timestamp - self.start) // timedelta(minutes=1)
+        return self.codes[minute % self.minutes]
+
+    def get_name(self, timestamp):
+        return self.names[self.get_code(timestamp)]
+
+
+def build_timeline(mgr, start, minutes):
+    """ Evaluates the events of a manager for every minute of a period, and
+        returns them as a Timeline.
+    """
+    # codes index this list, which marking may extend
+    names = list(mgr.rotation_data.names)
+    evaluator = mgr.get_batch_evaluator()
+    first = (start - epoch) // timedelta(minutes=1)
+    typecode = Timeline.get_typecode(names)
+    if numpy is not None:
+        minute = numpy.arange(first, first + minutes, dtype=numpy.int64)
+        codes, start_minute, offset, rot_count, tt = evaluator._evaluate(minute, _NumpyOps)
+        codes = mgr._mark_codes(codes, rot_count, tt, names, _NumpyOps)
+        codes = array(typecode, codes.astype(typecode).tobytes())
+    else:
+        codes = array(typecode)
+        for minute in range(first, first + minutes):
+            code, start_minute, offset, rot_count, tt = evaluator._evaluate(minute, _ScalarOps)
+            codes.append(mgr._mark_codes(code, rot_count, tt, names, _ScalarOps))
+    return Timeline(start, minutes, names, codes)
 
 
 class BaseScheduleManager(metaclass=abc.ABCMeta):
@@ -325,6 +899,18 @@ class BaseScheduleManager(metaclass=abc.ABCMeta):
         # the beginning of the schedule file, so that all future
         # cycles have the correct offset in the rotation.
         self.origin = origin
+        # built on first use, False if the schedule can not be indexed
+        self._event_index = None
+        # built on first use
+        self._batch_evaluator = None
+        # built on first use, False if the schedule has no timeline
+        self._timeline = None
+        # OccurenceTable by event name, built on first use
+        self._occurence_tables = {}
+        # Queries run on several threads. Structures built on first use
+        # are built under this lock, so that each is only built once.
+        # Reentrant, as some builds use the others.
+        self._build_lock = threading.RLock()
 
     @abc.abstractmethod
     def get_cycle_count(self, timestamp):
@@ -337,35 +923,94 @@ class BaseScheduleManager(metaclass=abc.ABCMeta):
         """ Get a CycleInfo object
         """
 
+    @abc.abstractmethod
+    def get_timetables(self):
+        """ The list of time tables this manager cycles through,
+            in rotation data order.
+        """
+
+    @abc.abstractmethod
+    def _get_batch_cycles(self, minutes, ops):
+        """ Cycle counts for minutes since the Unix epoch, using ops for
+            array operations. Returns a (time table index, cycles, cycle
+            minute) tuple where cycles has the cycle count of each time
+            table.
+        """
+
+    def _get_next_cycle_info(self, cycle_info, timestamp):
+        """ Get the CycleInfo for the cycle starting at timestamp, which
+            immediately follows cycle_info.
+        """
+        return self.get_cycle_info(timestamp)
+
+    def _mark_events(self, evts, ongoing=False):
+        """ Hook to update events before they are returned. Events are
+            immutable, updated ones are replaced in the returned list.
+            ongoing is True for events returned by get_event.
+        """
+        return evts
+
     def get_event(self, timestamp):
         """ Returns the name of the event occuring at given timestamp.
         """
         cycle_info = self.get_cycle_info(timestamp)
-        event = cycle_info.schedule.get_event(cycle_info)
-        minutes_in = event.cycle_minute - event.start_minute
-        new_ts = cptime(timestamp) - timedelta(minutes=minutes_in)
-        event.set_start_time(new_ts)
-        return event
+        cycle_start = cptime(timestamp) - timedelta(minutes=cycle_info.minute)
+        event = cycle_info.schedule.get_event(cycle_info, cycle_start)
+        return self._mark_events([event], ongoing=True)[0]
 
     def get_remaining_events(self, timestamp, all=False, filter=None):
         """ Events left in the current cycle.
         """
         cycle_info = self.get_cycle_info(timestamp)
-        remaining_events = cycle_info.schedule.get_remaining_events(cycle_info, all, filter)
-        # convert events relative times to datetimes
-        ts_events = []
-        for event in remaining_events:
-            minutes_in = event.start_minute - cycle_info.minute
-            event_start = cptime(timestamp) + timedelta(minutes=minutes_in)
-            event.set_start_time(event_start)
-            ts_events.append(event)
-        return ts_events
+        # events relative times are converted to datetimes from the cycle start
+        cycle_start = cptime(timestamp) - timedelta(minutes=cycle_info.minute)
+        remaining_events = cycle_info.schedule.get_remaining_events(cycle_info, all, filter, cycle_start)
+        return self._mark_events(remaining_events)
 
     def get_current_event(self):
         """ Returns the name of the event occuring now.
         """
         return self.get_event(datetime.now(timezone.utc))
 
+    def iter_events(self, start=None, names=None, until=None):
+        """ Yields events in order as they start after 'start', or
+            after current time if None. Cycles are followed one after
+            the other, each one built from the previous.
+
+            names: a list of event names to filter on, or
+                   None to yield any event name
+            until: stop once events start after this time, or
+                   None to never stop.
+        """
+        for event in self._iter_events(start, names, until):
+            yield self._mark_events([event])[0]
+
+    def _iter_events(self, start=None, names=None, until=None, cycle_info=None):
+        """ Same as iter_events, without applying _mark_events.
+            cycle_info may be given if it was already computed for start.
+        """
+        start = start or datetime.now(timezone.utc)
+        cycle_info = cycle_info or self.get_cycle_info(start)
+        cycle_start = cptime(start) - timedelta(minutes=cycle_info.minute)
+        all = False
+        while until is None or cycle_start <= until:
+            sched = cycle_info.schedule
+            for event in sched.iter_remaining_events(cycle_info, all, names, cycle_start):
+                if until is not None and event.start_time > until:
+                    return
+                if event.name == 'next':
+                    # move on to the following cycle
+                    cycle_start = event.start_time
+                    break
+                yield event
+            else:
+                return
+            cycle_info = self._get_next_cycle_info(cycle_info, cycle_start)
+            # event times stay relative to the cycle minute, which is only
+            # non-zero if cycles do not line up with the origin.
+            cycle_start -= timedelta(minutes=cycle_info.minute)
+            all = True
+
     def get_events(self, names=None, count=0, timestamp=None, limit=10080):
         """ Get a list of all events and their start time
             for the next 'next' minutes.
@@ -380,28 +1025,10 @@ class BaseScheduleManager(metaclass=abc.ABCMeta):
                    minutes in the future. Defaults to 7 days.
         """
         timestamp = timestamp or datetime.now(timezone.utc)
-        evts = []
         ts_limit = timestamp + timedelta(minutes=limit)
-        all = False
-        # events left in current cycle
-        cycle_start = timestamp
-        while cycle_start is not None:
-            next_events = self.get_remaining_events(cycle_start, all=all, filter=names)
-            for event in next_events:
-                if event.start_time <= ts_limit:
-                    if event.name == 'next':
-                        # we need to query the next cycle
-                        cycle_start = event.start_time
-                        all = True
-                    else:
-                        evts.append(event)
-                        if count and len(evts) >= count:
-                            # we reached the specified count of events
-                            return evts
-                else:
-                    # the next event is outside the timeframe
-                    cycle_start = None
-        return evts
+        if count:
+            return list(itertools.islice(self.iter_events(timestamp, names, ts_limit), count))
+        return list(self.iter_events(timestamp, names, ts_limit))
 
     def list_events(self, timestamp=None, next=60):
         """ Get a list of all events and their start time
@@ -415,13 +1042,189 @@ class BaseScheduleManager(metaclass=abc.ABCMeta):
         start_event = self.get_event(timestamp)
         return [start_event] + evts
 
-    def when_event(self, names, count=1, timestamp=None, limit=10080):
+    def when_event(self, names, count=1, timestamp=None, limit=None):
         """ When is the next instance of an event.
-            This is a shorthand to get_events that sets count to 1
-            and requires a names filter.
-            names can be given as a list of events to search for
+            names can be given as a list of events to search for.
+            When possible, occurences are computed from the event index,
+            so no horizon limit applies unless one is given (in minutes).
+            Otherwise, this is a shorthand to get_events with a names
+            filter, limited to 7 days by default.
+        """
+        timestamp = timestamp or datetime.now(timezone.utc)
+        if not count and not limit:
+            # do not list events forever
+            limit = 10080
+        index = self.get_event_index()
+        if index and index.covers(timestamp):
+            until = None
+            if limit:
+                until = timestamp + timedelta(minutes=limit)
+            evts = index.find_events(names, timestamp, count=count, until=until)
+            return self._mark_events(evts)
+        return self.get_events(names=names, count=count, timestamp=timestamp, limit=limit or 10080)
+
+    def resolve_window(self, name, timestamp=None, limit=10080):
+        """ Finds the event named 'name' that is ongoing at timestamp, or
+            else the next one, along with how many events of that name
+            occured before it. Both come from a single CycleInfo.
+            Returns an (event, count) tuple, or None if no such event starts
+            in the next 'limit' minutes.
+        """
+        timestamp = timestamp or datetime.now(timezone.utc)
+        cycle_info = self.get_cycle_info(timestamp)
+        # events of that name started before the cycle minute
+        count = cycle_info.get_event(name)
+        cycle_start = cptime(timestamp) - timedelta(minutes=cycle_info.minute)
+        current = cycle_info.schedule.get_event(cycle_info, cycle_start)
+        if current and current.name == name:
+            if current.cycle_minute > current.start_minute:
+                # the ongoing event is already counted
+                count -= 1
+            return (self._mark_events([current], ongoing=True)[0], count)
+        until = timestamp + timedelta(minutes=limit)
+        for evt in self._iter_events(timestamp, [name], until, cycle_info):
+            return (self._mark_events([evt])[0], count)
+        return None
+
+    def get_occurence_table(self, name):
+        """ The OccurenceTable for an event name, built on first use.
+            None if this manager's schedule can not be indexed.
+        """
+        if name not in self._occurence_tables:
+            with self._build_lock:
+                if name not in self._occurence_tables:
+                    table = None
+                    if self.get_event_index():
+                        table = OccurenceTable(self, name)
+                    self._occurence_tables[name] = table
+        return self._occurence_tables[name]
+
+    def get_events_at(self, timestamps):
+        """ Returns the events at many timestamps at once, as a tuple of
+            three arrays with one item per timestamp:
+            - event name codes, indexing rotation_data.names,
+            - event start times in minutes since the Unix epoch,
+            - event rotation offsets.
+            Arrays are NumPy arrays if NumPy is installed, and timestamps
+            may then also be an array of datetime64. Otherwise they are
+            computed in pure Python and returned as array('q').
+            Secret League marking does not apply to batch results.
+        """
+        return self.get_batch_evaluator().get_events_at(timestamps)
+
+    def get_batch_evaluator(self):
+        """ The BatchEvaluator for this manager, built on first use.
+        """
+        if self._batch_evaluator is None:
+            with self._build_lock:
+                if self._batch_evaluator is None:
+                    self._batch_evaluator = BatchEvaluator(self)
+        return self._batch_evaluator
+
+    def _mark_codes(self, codes, rot_counts, tts, names, ops):
+        """ Hook to update batch event codes, as _mark_events does for
+            events. names may be extended with new names to use as codes.
+        """
+        return codes
+
+    def get_frame_deltas(self, start, minutes):
+        """ How much each rotation counter moves on over a time frame,
+            by rotation ID.
         """
-        return self.get_events(names=names, count=count, timestamp=timestamp, limit=limit)
+        first = self.get_cycle_info(start)
+        following = self.get_cycle_info(start + timedelta(minutes=minutes))
+        return dict(
+                (rot_id, following._rotations[rot_id] - first._rotations[rot_id])
+                for rot_id in first._rotations
+            )
+
+    def _get_rotation_modulus(self, rotation):
+        """ The rotation counter value at which this rotation's events
+            repeat themselves.
+        """
+        return len(rotation)
+
+    def get_timeline_period(self):
+        """ Returns a (start time, minutes) tuple for the shortest run of
+            index frames after which every event repeats itself, rotations
+            and Secret League included.
+            Returns None if the schedule can not be indexed.
+        """
+        frame = self._get_index_frame()
+        if not frame:
+            return None
+        start, frame_minutes = frame
+        frames = 1
+        for rot_id, delta in self.get_frame_deltas(start, frame_minutes).items():
+            modulus = self._get_rotation_modulus(rotation_ids[rot_id])
+            frames = math.lcm(frames, modulus // math.gcd(delta, modulus))
+        return (start, frame_minutes * frames)
+
+    def get_timeline_size(self):
+        """ How many bytes the timeline takes once built, without building
+            it. Zero if this manager has no timeline.
+        """
+        period = self.get_timeline_period()
+        if not period:
+            return 0
+        typecode = Timeline.get_typecode(self.rotation_data.names)
+        return period[1] * array(typecode).itemsize
+
+    def get_timeline(self):
+        """ The Timeline for this manager, built on first use.
+            None if this manager's schedule can not be indexed.
+        """
+        if self._timeline is None:
+            with self._build_lock:
+                if self._timeline is None:
+                    period = self.get_timeline_period()
+                    if not period:
+                        self._timeline = False
+                    else:
+                        self._timeline = build_timeline(self, *period)
+        return self._timeline or None
+
+    def set_timeline(self, timeline):
+        """ Use a timeline built elsewhere, e.g. loaded from a shared file.
+            It must cover this manager's timeline period.
+        """
+        if (timeline.start, timeline.minutes) != self.get_timeline_period():
+            raise ValueError("Timeline does not match this schedule's period.")
+        with self._build_lock:
+            self._timeline = timeline
+
+    def get_event_name(self, timestamp=None):
+        """ Returns the name of the event occuring at given timestamp,
+            looked up from the timeline when possible.
+        """
+        timestamp = timestamp or datetime.now(timezone.utc)
+        timeline = self.get_timeline()
+        if timeline and timeline.covers(timestamp):
+            return timeline.get_name(timestamp)
+        return self.get_event(timestamp).name
+
+    def _get_index_frame(self):
+        """ Returns a (start time, minutes) tuple describing a time frame
+            that repeats itself, in that each following frame has the same
+            events at the same times, with rotations moved on by a constant
+            count. Events are indexed from this frame onwards.
+            Returns None if the schedule can not be indexed.
+        """
+        return None
+
+    def get_event_index(self):
+        """ The EventIndex for this manager, built on first use.
+            None if this manager's schedule can not be indexed.
+        """
+        if self._event_index is None:
+            with self._build_lock:
+                if self._event_index is None:
+                    frame = self._get_index_frame()
+                    if not frame:
+                        self._event_index = False
+                    else:
+                        self._event_index = EventIndex(self, *frame)
+        return self._event_index or None
 
 
 class Slot1ScheduleManager(BaseScheduleManager):
@@ -452,6 +1255,26 @@ class Slot1ScheduleManager(BaseScheduleManager):
         cycle_minute = minutes % self.sched.duration
         return CycleInfo(self.sched, cycle, self.rotation_data, cycle_minute)
 
+    def get_timetables(self):
+        return [self.sched]
+
+    def _get_batch_cycles(self, minutes, ops):
+        """ A single time table, cycling from origin.
+        """
+        minutes = minutes - (self.origin - epoch) // timedelta(minutes=1)
+        cycles, cycle_minute = minutes // self.sched.duration, minutes % self.sched.duration
+        return 0, (cycles,), cycle_minute
+
+    def _get_next_cycle_info(self, cycle_info, timestamp):
+        """ Cycles always follow each other on the same time table.
+        """
+        return cycle_info.get_next_cycle(self.sched)
+
+    def _get_index_frame(self):
+        """ Each cycle is one frame, starting from origin.
+        """
+        return (self.origin, self.sched.duration)
+
 
 class Slot2ScheduleManager(BaseScheduleManager):
     """ Used to manage the cycle of schedules based on current time
@@ -469,35 +1292,24 @@ class Slot2ScheduleManager(BaseScheduleManager):
         self.weekend = TimeTable(weekend_sched, "weekend")
         # Rotation Data
         self.rotation_data = build_rotation_data([self.weekday, self.weekend])
-        # Since 1.5.0, slot2mgr has been updated to support GP rotations
-        # that do not start at 0:00 on the first day
-        # This caches some data in relation to this.
-        self._set_alt_origin()
+        # Weekday/weekend minutes between week_origin and origin, so that
+        # origins that are not at 0:00 on day 1 are accounted for.
+        self._origin_minutes = minutes_by_day_type(self.origin)
+        # Whether cycles fit evenly in a day and start on the origin, so that
+        # each cycle can be counted from the previous one.
+        origin_minute = self.origin.hour * 60 + self.origin.minute
+        self._aligned_cycles = all(
+                (24 * 60) % tt.duration == 0 and origin_minute % tt.duration == 0
+                for tt in (self.weekday, self.weekend)
+            )
         self._secret_cfg = None
         self._we_secret_cfg = None
         # if Secret League is happening (v1.7.0)
         self._secret_cfg = secret_cfg
         # optional Weekend Secret League config for League Weekend events
         self._we_secret_cfg = we_secret_cfg
-
-    def _set_alt_origin(self):
-        """ We may cache the next day from origin and the number of
-            minutes between origin and this next day.
-            This is to facilitate rotation offset calculations when
-            the origin is not at 0:00 on day 1.
-        """
-        if self.origin.hour or self.origin.minute:
-            tmr = self.origin + timedelta(days=1)
-            self._alt_origin = datetime(tmr.year, tmr.month, tmr.day, 0, 0,
-                    tzinfo=timezone.utc)
-            day1mins = (24 - self.origin.hour) * 60 + self.origin.minute
-            if self.origin.weekday() < 5:
-                self._day1mins = (day1mins, 0)
-            else:
-                self._day1mins = (0, day1mins)
-        else:
-            self._alt_origin = None
-            self._day1mins = (0, 0)
+        # Secret League lookup tables for batch marking, by array ops
+        self._glitch_tables = {}
 
     def time_types_since_origin(self, until=None):
         """ Utility for breaking down the current time (or the optional
@@ -506,40 +1318,21 @@ class Slot2ScheduleManager(BaseScheduleManager):
             The result is returned as a tuple of 2 ints.
         """
         now = until or datetime.now(timezone.utc)
-        if now.date() != self.origin.date() and self._alt_origin:
-            origin = self._alt_origin
-            wd_minutes = self._day1mins[0]
-            we_minutes = self._day1mins[1]
-        else:
-            origin = self.origin
-            wd_minutes = 0
-            we_minutes = 0
-        delta = now - origin
-        # count full weeks
-        weeks = delta.days // 7
-        week_days = weeks * 5
-        weekend_days = weeks * 2
-        minutes_today = delta.seconds // 60
-        # add remaining days
-        remainder = delta.days % 7
-        # this list can contain negative weekdays depending what day is now
-        days = [day for day in range(now.weekday() - remainder, now.weekday())]
-        # make all days be an int from 0 (monday) to 6 (sunday)
-        days = [day if day >= 0 else day + 7 for day in days]
-        # update count for week days and week end days
-        for day in days:
-            if day < 5:
-                week_days += 1
-            else:
-                weekend_days += 1
-        # convert to minutes
-        wd_minutes += week_days * 24 * 60
-        we_minutes += weekend_days * 24 * 60
-        if now.weekday() < 5:
-            wd_minutes += minutes_today
-        else:
-            we_minutes += minutes_today
-        return (wd_minutes, we_minutes)
+        wd_minutes, we_minutes = minutes_by_day_type(now)
+        return (wd_minutes - self._origin_minutes[0], we_minutes - self._origin_minutes[1])
+
+    def _get_index_frame(self):
+        """ Each week is one frame, starting on Monday.
+            The first week is skipped since rotations that did not occur yet
+            fall back to the overall cycle count.
+        """
+        if not self._aligned_cycles:
+            return None
+        # the first midnight a week or more after origin, then the first monday
+        day = (self.origin + timedelta(days=7, minutes=-1)).date() + timedelta(days=1)
+        day += timedelta(days=(7 - day.weekday()) % 7)
+        monday = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+        return (monday, WEEK_MINUTES)
 
     @property
     def daily_weekday_cycles(self):
@@ -594,6 +1387,37 @@ class Slot2ScheduleManager(BaseScheduleManager):
         cycle_minute = day_minutes % sched.duration
         return CycleInfo(sched, tt_count, self.rotation_data, cycle_minute)
 
+    def get_timetables(self):
+        return [self.weekday, self.weekend]
+
+    def _get_batch_cycles(self, minutes, ops):
+        """ Same as get_cycle_info, with minutes_by_day_type inlined.
+        """
+        minutes = minutes - (week_origin - epoch) // timedelta(minutes=1)
+        weeks, week_minute = minutes // WEEK_MINUTES, minutes % WEEK_MINUTES
+        day, day_minute = week_minute // (24 * 60), week_minute % (24 * 60)
+        weekend = ops.where(day < 5, 0, 1)
+        # full days so far this week, then minutes in the current day
+        wd_minutes = weeks * 5 * 24 * 60 + ops.where(day < 5, day, 5) * 24 * 60
+        we_minutes = weeks * 2 * 24 * 60 + ops.where(day < 5, 0, day - 5) * 24 * 60
+        wd_minutes = wd_minutes + (1 - weekend) * day_minute - self._origin_minutes[0]
+        we_minutes = we_minutes + weekend * day_minute - self._origin_minutes[1]
+        cycles = (wd_minutes // self.weekday.duration, we_minutes // self.weekend.duration)
+        durations = (self.weekday.duration, self.weekend.duration)
+        cycle_minute = day_minute % ops.where(day < 5, *durations)
+        return weekend, cycles, cycle_minute
+
+    def _get_next_cycle_info(self, cycle_info, timestamp):
+        """ When cycles line up with days and origin, the next cycle's
+            counts follow from the previous one. Otherwise, compute them
+            from the timestamp.
+        """
+        if not self._aligned_cycles:
+            return self.get_cycle_info(timestamp)
+        if self.is_weekday(timestamp):
+            return cycle_info.get_next_cycle(self.weekday)
+        return cycle_info.get_next_cycle(self.weekend)
+
     def _get_daily_event_count(self, day_type, name):
         """ How many times an event occurs in a given day.
             Will raise if cannot be accurately estimated.
@@ -622,31 +1446,124 @@ class Slot2ScheduleManager(BaseScheduleManager):
     def get_daily_weekend_event_count(self, name):
         return self._get_daily_event_count("weekend", name)
 
-    def get_remaining_events(self, timestamp, all=False, filter=None):
-        """ Events left in the current cycle.
-            Overrides base class to manage Mystery GP (v1.7)
+    def _mark_events(self, evts, ongoing=False):
+        """ Overrides base class to manage Mystery GP (v1.7)
         """
-        evts = super().get_remaining_events(timestamp, all, filter)
         if self._secret_cfg:
-            evts = self._apply_glitch(evts)
+            evts = self._apply_glitch(evts, ongoing)
         return evts
 
-    def get_event(self, cycle_info):
-        """ Finds the ongoing event.
-            Overrides base class to manage Mystery GP (v1.7)
+    def _get_rotation_modulus(self, rotation):
+        """ Overrides base class so that Grand Prix rotations also repeat
+            their Secret League pattern.
         """
-        evt = super().get_event(cycle_info)
-        if self._secret_cfg:
-            evt = self._apply_glitch([evt], ongoing=True)[0]
-        return evt
+        modulus = len(rotation)
+        if self._secret_cfg and not secret_league.GP_NAMES.isdisjoint(rotation):
+            for cfg in (self._secret_cfg, self._we_secret_cfg):
+                if cfg:
+                    modulus = math.lcm(modulus, cfg.length)
+        return modulus
+
+    def _mark_codes(self, codes, rot_counts, tts, names, ops):
+        """ Overrides base class to manage Mystery GP (v1.7)
+        """
+        if not self._secret_cfg:
+            return codes
+        if "glitchgp" not in names:
+            names.append("glitchgp")
+        tables = self._glitch_tables.get(ops)
+        if tables is None:
+            with self._build_lock:
+                tables = self._glitch_tables.get(ops)
+                if tables is None:
+                    # the last entry is looked up for unknown names (code -1)
+                    is_gp = ops.table(name in secret_league.GP_NAMES for name in names)
+                    cfgs = [ops.table(cfg.glitch_table)
+                            for cfg in (self._secret_cfg, self._we_secret_cfg or self._secret_cfg)]
+                    tables = self._glitch_tables[ops] = (is_gp, cfgs)
+        is_gp, (wd_glitch, we_glitch) = tables
+        glitch = ops.where(
+                tts == 0,
+                ops.take(wd_glitch, rot_counts % len(wd_glitch)),
+                ops.take(we_glitch, rot_counts % len(we_glitch)),
+            )
+        glitch = ops.take(is_gp, codes) & glitch
+        return ops.where(glitch, names.index("glitchgp"), codes)
+
+    def _get_secret_cfg(self, schedule_name):
+        """ The Secret League config that applies to a time table.
+        """
+        if not self._we_secret_cfg or schedule_name == "weekday":
+            return self._secret_cfg
+        return self._we_secret_cfg
+
+    def _get_glitch_residues(self, evt):
+        """ Rotation counter values, modulo the returned modulus, at which
+            the event's slot has a Secret League.
+        """
+        cfg = self._get_secret_cfg(evt.schedule_name)
+        rotation = evt.rotation
+        modulus = math.lcm(len(rotation), cfg.length)
+        indices = set(cfg.indices)
+        residues = [
+                counter for counter in range(modulus)
+                if counter % cfg.length in indices
+                and rotation[counter % len(rotation)] in secret_league.GP_NAMES
+            ]
+        return modulus, residues
+
+    def when_secret_league(self, count=1, timestamp=None, limit=None):
+        """ The next 'count' Secret League events.
+            When possible, they are computed from the event index: Secret
+            Leagues replace the Grand Prix whose rotation counter falls on
+            the config indices, so they repeat with the counter.
+            Otherwise, Grand Prix are listed until enough of them glitch.
+            limit is in minutes, as for when_event.
+        """
+        if not self._secret_cfg:
+            return []
+        timestamp = timestamp or datetime.now(timezone.utc)
+        until = None
+        if limit:
+            until = timestamp + timedelta(minutes=limit)
+        index = self.get_event_index()
+        if index and index.covers(timestamp):
+            rules = index.get_rules("glitchgp", self._get_glitch_residues)
+            evts = index.find_events(None, timestamp, count=count, until=until, rules=rules)
+            return self._mark_events(evts)
+        until = until or timestamp + timedelta(minutes=10080)
+        gp_evts = self.iter_events(timestamp, secret_league.GP_NAMES, until)
+        glitches = (evt for evt in gp_evts if evt.glitch)
+        if count:
+            return list(itertools.islice(glitches, count))
+        return list(glitches)
 
     def _apply_glitch(self, evts, ongoing=False):
-        # look up glitch events occuring during the events period
-        for evt in evts:
-            if not self._we_secret_cfg or evt.schedule_name == "weekday":
-                if self._secret_cfg.can_glitch(evt, ongoing):
-                    evt.glitch = True
+        """ Returns the batch with its Secret League events replaced by
+            glitched copies. Ongoing events are all checked against the
+            same reference time.
+        """
+        now = None
+        wd_table = self._secret_cfg.glitch_table
+        we_table = (self._we_secret_cfg or self._secret_cfg).glitch_table
+        gp_names = secret_league.GP_NAMES
+        # copied on the first glitch, most batches have none
+        marked = evts
+        for idx, evt in enumerate(evts):
+            if evt.name not in gp_names:
+                continue
+            if evt.schedule_name == "weekday":
+                cfg, table = self._secret_cfg, wd_table
+            else:
+                cfg, table = self._we_secret_cfg or self._secret_cfg, we_table
+            if ongoing:
+                if now is None:
+                    now = datetime.now(timezone.utc)
+                glitch = cfg.can_glitch(evt, ongoing, now)
             else:
-                if self._we_secret_cfg.can_glitch(evt, ongoing):
-                    evt.glitch = True
-        return evts
\ No newline at end of file
+                glitch = table[evt.cycle % len(table)]
+            if glitch:
+                if marked is evts:
+                    marked = list(evts)
+                marked[idx] = evt.as_glitch()
+        return marked
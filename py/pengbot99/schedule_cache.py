@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+
+# local imports
+from pengbot99 import schedule
+from pengbot99 import utils
+
+
+# Default cache file, in the bot's working directory.
+CACHE_PATH = ".schedule_cache"
+# Bump when the cached data layout changes.
+CACHE_VERSION = 1
+
+
+def _hash_file(path):
+    with open(path, "rb") as fd:
+        return hashlib.sha256(fd.read()).hexdigest()
+
+
+class ScheduleCache(object):
+    """ Parsed schedules and values derived from them, saved between runs.
+        Each schedule is stored with the stamp of its CSV file: its mtime,
+        size and hash. A schedule is parsed again only if its file changed.
+        If only the mtime changed (e.g. after a deploy), the hash is checked
+        before giving up on the cached schedule.
+        Derived values are stored with the names of the schedules they
+        depend on, and are dropped when any of them changes.
+    """
+    def __init__(self, config_path, path=None):
+        super().__init__()
+        self.config_path = config_path
+        self.path = path or CACHE_PATH
+        # name: [mtime_ns, size, sha256]
+        self._stamps = {}
+        self._schedules = {}
+        # key: [value, schedule names]
+        self._values = {}
+        # schedule names checked against their file in this run
+        self._checked = {}
+        self.dirty = False
+        self._read()
+
+    def _read(self):
+        try:
+            with open(self.path) as fd:
+                data = json.load(fd)
+        except FileNotFoundError:
+            return
+        except Exception as exc:
+            utils.log("Ignoring unreadable schedule cache {0}: '{1}'".format(self.path, str(exc)))
+            return
+        if data.get("version") != CACHE_VERSION or data.get("config_path") != self.config_path:
+            return
+        self._stamps = data["stamps"]
+        self._schedules = data["schedules"]
+        self._values = data["values"]
+
+    def save(self):
+        """ Writes the cache if anything changed since it was read.
+        """
+        if not self.dirty:
+            return
+        data = {
+                "version": CACHE_VERSION,
+                "config_path": self.config_path,
+                "stamps": self._stamps,
+                "schedules": self._schedules,
+                "values": self._values,
+            }
+        tmp_path = "{0}.{1}.tmp".format(self.path, os.getpid())
+        try:
+            with open(tmp_path, "w") as fd:
+                json.dump(data, fd)
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            # the bot runs fine without a cache
+            utils.log("Unable to save schedule cache {0}: '{1}'".format(self.path, str(exc)))
+            return
+        self.dirty = False
+
+    def _is_fresh(self, name):
+        """ Whether the CSV file for a schedule is unchanged since it was
+            last cached. The result holds for the whole run.
+        """
+        if name in self._checked:
+            return self._checked[name]
+        csv_path = "{0}/{1}.csv".format(self.config_path, name)
+        stat = os.stat(csv_path)
+        stamp = self._stamps.get(name)
+        fresh = False
+        if stamp:
+            if stamp[:2] == [stat.st_mtime_ns, stat.st_size]:
+                fresh = True
+            elif stamp[1] == stat.st_size and stamp[2] == _hash_file(csv_path):
+                # same content, only remember the new mtime
+                stamp[0] = stat.st_mtime_ns
+                self.dirty = True
+                fresh = True
+        if not fresh:
+            self._stamps[name] = [stat.st_mtime_ns, stat.st_size, _hash_file(csv_path)]
+            self._schedules.pop(name, None)
+        self._checked[name] = fresh
+        return fresh
+
+    def load_schedule(self, name):
+        """ Same as schedule.load_schedule, for the config folder.
+        """
+        if self._is_fresh(name) and name in self._schedules:
+            rows = [tuple(row) for row in self._schedules[name]]
+            return schedule.intern_schedule(rows)
+        rows = schedule.load_schedule(self.config_path, name)
+        self._schedules[name] = rows
+        self.dirty = True
+        return rows
+
+    def get_value(self, key, depends, compute_fn):
+        """ Returns the value cached for key, or computes it with
+            compute_fn if any of the schedule names in depends changed.
+            Values must be JSON serializable.
+        """
+        entry = self._values.get(key)
+        fresh = [self._is_fresh(name) for name in depends]
+        if entry and entry[1] == list(depends) and all(fresh):
+            return entry[0]
+        value = compute_fn()
+        self._values[key] = [value, list(depends)]
+        self.dirty = True
+        return value
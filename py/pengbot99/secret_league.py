@@ -1,6 +1,10 @@
 from pengbot99 import utils
 
 
+# Grand Prix event names that Secret League can replace
+GP_NAMES = frozenset(('knight', 'mknight', 'queen', 'mqueen', 'king', 'mking', 'ace', 'mace'))
+
+
 class SecretLeagueDataError(Exception):
     pass
 
@@ -31,6 +35,9 @@ class SecretLeagueConfig(object):
         self._intervals = intervals
         self._indices = sorted([(sum(intervals[:i]) + offset) % sum(intervals) for i in range(len(intervals))])
         self.offset = offset
+        # whether a GP is replaced, for each cycle modulo length
+        indices = set(self._indices)
+        self._glitch_table = tuple(idx in indices for idx in range(self.length))
 
     @property
     def length(self):
@@ -48,19 +55,26 @@ class SecretLeagueConfig(object):
     def indices(self):
         return self._indices
 
-    def can_glitch(self, event, ongoing=False):
-        if event.name not in ('knight', 'mknight', 'queen', 'mqueen', 'king', 'mking', 'ace', 'mace'):
+    @property
+    def glitch_table(self):
+        return self._glitch_table
+
+    def can_glitch(self, event, ongoing=False, now=None):
+        """ Whether a Grand Prix is replaced by a Secret League.
+            now is the reference time for ongoing events, so that a batch
+            of events is checked at the same time. Defaults to current time.
+        """
+        if event.name not in GP_NAMES:
             return False
-        if not ongoing and event.cycle % self.length in self.indices:
+        table = self._glitch_table
+        if not ongoing:
             # event came from a get_remaining_events query
-            return True
-        if ongoing:
-            # event came from a TimeTable.get_event query.
-            # If it is past its first minute, the cycle is already counted.
-            if event.get_seconds_left() // 60 < event.duration - 1:
-                if (event.cycle - 1) % self.length in self.indices:
-                    utils.log("Correcting event cycle for {0}.".format(event.name))
-                    return True
-            elif event.cycle % self.length in self.indices:
+            return table[event.cycle % len(table)]
+        # event came from a TimeTable.get_event query.
+        # If it is past its first minute, the cycle is already counted.
+        if event.get_seconds_left(now) // 60 < event.duration - 1:
+            if table[(event.cycle - 1) % len(table)]:
+                utils.log("Correcting event cycle for {0}.".format(event.name))
                 return True
-        return False
+            return False
+        return table[event.cycle % len(table)]
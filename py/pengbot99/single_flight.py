@@ -0,0 +1,53 @@
+import asyncio
+import concurrent.futures
+
+
+class SingleFlight(object):
+    """ Runs schedule queries off the event loop, once for all the
+        identical queries made while one is in flight.
+        Queries are keyed by kind and normalized arguments. A query made
+        while the same one is running awaits its result instead of running
+        again, and is counted as coalesced.
+        Queries run on a bounded pool of worker threads, so schedule
+        managers are read from several threads at once. They are kept in
+        memory, and build their lazy structures once under a lock, so
+        threads are used rather than processes.
+    """
+    def __init__(self, executor=None, max_workers=1):
+        super().__init__()
+        if executor is None:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="schedule")
+        self._executor = executor
+        # (kind, args): future for the query in flight
+        self._flights = {}
+        # kind: [calls, coalesced calls]
+        self.counts = {}
+
+    async def run(self, kind, args, compute_fn):
+        """ Returns compute_fn's result, computed once for all concurrent
+            calls with the same kind and args.
+        """
+        key = (kind, args)
+        counts = self.counts.setdefault(kind, [0, 0])
+        counts[0] += 1
+        future = self._flights.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, compute_fn)
+            self._flights[key] = future
+            future.add_done_callback(lambda done: self._end_flight(key, done))
+        else:
+            counts[1] += 1
+        # a cancelled caller must not cancel the query for the others
+        return await asyncio.shield(future)
+
+    def _end_flight(self, key, future):
+        if self._flights.get(key) is future:
+            del self._flights[key]
+
+    def get_totals(self):
+        """ Returns (calls, coalesced calls) over all kinds.
+        """
+        calls = sum(counts[0] for counts in self.counts.values())
+        coalesced = sum(counts[1] for counts in self.counts.values())
+        return calls, coalesced
@@ -0,0 +1,161 @@
+from datetime import datetime
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+# local imports
+from pengbot99 import schedule
+
+
+# File layout: magic, header length, JSON header, then the code arrays.
+MAGIC = b"PB99TL01"
+HEADER_LENGTH = struct.Struct("<I")
+# code arrays start on multiples of this many bytes
+ALIGNMENT = 8
+
+
+class TimelineFileError(Exception):
+    pass
+
+
+def config_key(config_path):
+    """ A hash of every file in the config folder, constants included.
+        Timelines written with one key are only valid for the same config.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(config_path)):
+        file_path = os.path.join(config_path, name)
+        if not os.path.isfile(file_path):
+            continue
+        digest.update(name.encode("utf-8") + b"\0")
+        with open(file_path, "rb") as fd:
+            digest.update(fd.read())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get_path(folder, key):
+    return os.path.join(folder, "timelines-{0}.bin".format(key[:16]))
+
+
+def write_timelines(path, key, mgrs):
+    """ Writes the timelines of schedule managers to path.
+        mgrs is a dict of schedule managers by name. Managers that have no
+        timeline are left out.
+        The file is written next to path then moved in place, so that
+        processes that already mapped the previous file keep reading it.
+    """
+    entries = {}
+    blobs = []
+    offset = 0
+    for name, mgr in mgrs.items():
+        timeline = mgr.get_timeline()
+        if not timeline:
+            continue
+        data = timeline.codes.tobytes()
+        entries[name] = {
+                "start": timeline.start.isoformat(),
+                "minutes": timeline.minutes,
+                "names": timeline.names,
+                "typecode": timeline.typecode,
+                "offset": offset,
+                "length": len(data),
+            }
+        padding = -len(data) % ALIGNMENT
+        blobs.append(data + b"\0" * padding)
+        offset += len(data) + padding
+    header = json.dumps({"key": key, "timelines": entries}).encode("utf-8")
+    # code arrays offsets are relative to the aligned end of the header
+    header_end = len(MAGIC) + HEADER_LENGTH.size + len(header)
+    header += b" " * (-header_end % ALIGNMENT)
+    tmp_path = "{0}.{1}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as fd:
+        fd.write(MAGIC)
+        fd.write(HEADER_LENGTH.pack(len(header)))
+        fd.write(header)
+        for blob in blobs:
+            fd.write(blob)
+    os.replace(tmp_path, path)
+
+
+class TimelineFile(object):
+    """ A timelines file, mapped read-only in memory.
+        Timelines read from it share the mapped pages, with any process
+        mapping the same file, and their codes are never copied.
+        The mapping stays open as long as this object and its timelines are
+        in use.
+    """
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        with open(path, "rb") as fd:
+            self._mmap = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if view[:len(MAGIC)] != MAGIC:
+            raise TimelineFileError("Not a timelines file: {0}".format(path))
+        start = len(MAGIC) + HEADER_LENGTH.size
+        header_len = HEADER_LENGTH.unpack(view[len(MAGIC):start])[0]
+        header = json.loads(bytes(view[start:start + header_len]).decode("utf-8"))
+        self.key = header["key"]
+        self._entries = header["timelines"]
+        self._data_start = start + header_len
+        self._view = view
+
+    @property
+    def names(self):
+        return list(self._entries)
+
+    def get_period(self, name):
+        """ The (start time, minutes) period of the named timeline, or None
+            if this file doesn't have it.
+        """
+        entry = self._entries.get(name)
+        if not entry:
+            return None
+        return (datetime.fromisoformat(entry["start"]), entry["minutes"])
+
+    def close(self):
+        """ Unmaps the file. Timelines read from it must not be in use.
+        """
+        self._view.release()
+        self._mmap.close()
+
+    def get_timeline(self, name):
+        """ Returns the named timeline, or None if this file doesn't have it.
+        """
+        entry = self._entries.get(name)
+        if not entry:
+            return None
+        first = self._data_start + entry["offset"]
+        codes = self._view[first:first + entry["length"]].cast(entry["typecode"])
+        start = datetime.fromisoformat(entry["start"])
+        return schedule.Timeline(start, entry["minutes"], entry["names"], codes)
+
+
+def share_timelines(folder, key, mgrs):
+    """ Sets the timelines of schedule managers from the timelines file for
+        key in folder. If the file is missing or lacks any of the managers'
+        timelines, it is written first.
+        Returns the TimelineFile.
+    """
+    path = get_path(folder, key)
+    periods = dict((name, mgr.get_timeline_period()) for name, mgr in mgrs.items())
+    expected = [name for name, period in periods.items() if period]
+    tl_file = None
+    if os.path.exists(path):
+        tl_file = TimelineFile(path)
+        up_to_date = tl_file.key == key and all(
+                tl_file.get_period(name) == periods[name] for name in expected
+            )
+        if not up_to_date:
+            tl_file.close()
+            tl_file = None
+    if tl_file is None:
+        write_timelines(path, key, mgrs)
+        tl_file = TimelineFile(path)
+    for name in expected:
+        mgrs[name].set_timeline(tl_file.get_timeline(name))
+    return tl_file
@@ -35,6 +35,12 @@ mp_event_choices = {
 }
 
 
+# Event types to look up tracks for, Mini-Prix or 99 races
+findtrack_event_choices = dict(mp_event_choices, **{
+    "99 Races": "ninetynine",
+})
+
+
 mp_track_choices = {
     "Big Blue": "Big_Blue",
     "Big Blue II": "Big_Blue_II",
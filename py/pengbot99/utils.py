@@ -1,6 +1,7 @@
 from datetime import datetime
 
 import os
+import time
 
 
 def load_env(path=None):
@@ -53,6 +54,27 @@ def log(text):
     print("{0} {1} {2}".format(ymd, hms, text))
 
 
+class PhaseTimer(object):
+    """ Measures how long consecutive phases of a task take.
+    """
+    def __init__(self):
+        super().__init__()
+        self.phases = []
+        self._last = time.perf_counter()
+
+    def mark(self, name):
+        """ Ends the current phase, naming it.
+        """
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def log(self, title):
+        timings = ", ".join("{0} {1:.1f}ms".format(name, secs * 1000) for name, secs in self.phases)
+        total = sum(secs for name, secs in self.phases) * 1000
+        log("{0} in {1:.1f}ms: {2}".format(title, total, timings))
+
+
 MSG_ENV_PATH = ".msg_struct"
 
 
@@ -0,0 +1,85 @@
+# Python imports
+from datetime import datetime, timedelta, timezone
+import unittest
+
+# Local import
+from pengbot99 import choicerace
+from pengbot99 import schedule
+from pengbot99 import utils
+
+
+class TestTrackSearch(unittest.TestCase):
+    """ 99 races on a track, found from the track index with Glitch
+        overrides, are the ones listed by going through every race.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        slot1sched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot1_schedule')
+        nnsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'ninetynine_schedule')
+        glitch_mgr = schedule.Slot1ScheduleManager(schedule.glitch_origin, slot1sched)
+        self.mgr = choicerace.init_99_manager(glitch_mgr=glitch_mgr, minutes_offset=25, nnsched=nnsched)
+
+    def list_races(self, start, until):
+        races = {}
+        timestamp = start
+        while timestamp <= until:
+            evts = self.mgr.list_events(timestamp, next=60)
+            for evt in evts:
+                if start.replace(second=0) <= evt.start_time <= until:
+                    # keep the race as listed before any Glitch started
+                    races.setdefault(evt.start_time, evt.name)
+            timestamp = evts[-1].start_time - timedelta(minutes=5)
+        return sorted(races.items())
+
+    def test_period(self):
+        start, minutes = self.mgr._get_period()
+        self.assertEqual(start, schedule.origin + timedelta(minutes=25))
+        self.assertEqual(minutes % 34, 0)
+        self.assertEqual(minutes % (205 * 5), 0)
+
+    def test_tracks(self):
+        start = datetime(2026, 3, 3, 10, 17, 31, tzinfo=timezone.utc)
+        until = start + timedelta(days=1)
+        races = self.list_races(start, until)
+        for track in ("Mystery_5", "Big_Blue", "Port_Town_I"):
+            for mirrored in (True, False, None):
+                names = ['m' + track, track]
+                if mirrored is not None:
+                    names = names[:1] if mirrored else names[1:]
+                expected = [(ts, name) for ts, name in races
+                            if any(race in names for race in name.split(' <> '))]
+                found = [(evt.start_time, evt.name)
+                         for evt in self.mgr.iter_track(track, start, until, mirrored)]
+                self.assertEqual(found, expected, (track, mirrored))
+            self.assertTrue(found)
+
+
+class TestGlitchOverride(unittest.TestCase):
+    """ Races starting during a Glitch have their track 1 replaced.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        slot1sched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot1_schedule')
+        nnsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'ninetynine_schedule')
+        self.glitch_mgr = schedule.Slot1ScheduleManager(schedule.glitch_origin, slot1sched)
+        self.mgr = choicerace.init_99_manager(glitch_mgr=self.glitch_mgr, minutes_offset=25, nnsched=nnsched)
+
+    def test_day(self):
+        start = datetime(2026, 3, 3, 10, 0, tzinfo=timezone.utc)
+        evts = self.mgr.list_events(start, next=24 * 60)
+        races = self.mgr.mgr.list_events(start, next=24 * 60)
+        self.assertEqual([evt.start_time for evt in evts], [race.start_time for race in races])
+        glitched = 0
+        for evt, race in zip(evts, races):
+            glitch = self.glitch_mgr.get_event(evt.start_time)
+            tracks = choicerace.parse_race(race.name)
+            if self.mgr.is_glitch(glitch):
+                tracks = (choicerace.parse_race(evt.name)[0],) + tracks[1:]
+                self.assertTrue(tracks[0].startswith("Mystery_"))
+                glitched += 1
+            self.assertEqual(choicerace.parse_race(evt.name), tracks)
+        self.assertGreater(glitched, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
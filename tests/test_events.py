@@ -0,0 +1,50 @@
+# Python imports
+from datetime import datetime, timedelta, timezone
+import unittest
+
+# Local import
+from pengbot99 import events
+
+
+class TestImmutableEvents(unittest.TestCase):
+    """ Events are never changed, variants are new events.
+    """
+    def setUp(self):
+        self.start = datetime(2024, 12, 4, 21, 0, tzinfo=timezone.utc)
+        self.evt = events.Event("king", cycle=7, start_minute=10, end_minute=20, start_time=self.start)
+
+    def test_immutable(self):
+        with self.assertRaises(events.EventModificationError):
+            self.evt.cycle = 8
+        with self.assertRaises(events.EventModificationError):
+            self.evt._name = "queen"
+        with self.assertRaises(events.EventModificationError):
+            del self.evt.glitch
+
+    def test_variants(self):
+        glitched = self.evt.as_glitch()
+        self.assertEqual((glitched.name, glitched.glitched_name, glitched.cycle), ("glitchgp", "king", 7))
+        self.assertEqual(self.evt.renamed("queen").name, "queen")
+        delayed = self.evt.delayed(timedelta(minutes=3))
+        self.assertEqual((delayed.start_time, delayed.duration), (self.start + timedelta(minutes=3), 7))
+        self.assertEqual(self.evt.cut_short(timedelta(minutes=4)).end_time, self.start + timedelta(minutes=6))
+        first, second = self.evt.split_by_glitch(True, timedelta(minutes=4))
+        self.assertTrue(first.glitch)
+        self.assertEqual((first.end_time, second.start_time), (self.start + timedelta(minutes=6), self.start + timedelta(minutes=4)))
+        # the original is left as is
+        self.assertEqual((self.evt.name, self.evt.start_time, self.evt.duration), ("king", self.start, 10))
+        with self.assertRaises(TypeError):
+            self.evt.replace(colour="red")
+
+    def test_miniprix_variant(self):
+        evt = events.MiniPrixEvent("miniprix", "1", "Mute_City_I", "Big_Blue", "Sand_Ocean", mirrored="010",
+                                   start_minute=0, end_minute=1, start_time=self.start)
+        self.assertEqual(evt.races, ("Mute_City_I", "mBig_Blue", "Sand_Ocean"))
+        unmirrored = evt.replace(mirrored="000")
+        self.assertEqual(unmirrored.races, ("Mute_City_I", "Big_Blue", "Sand_Ocean"))
+        self.assertEqual(unmirrored.name, "Mute_City_I > Big_Blue > Sand_Ocean (MiniPrix1)")
+        self.assertEqual(evt.races[1], "mBig_Blue")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# Python imports
+import threading
+import unittest
+
+# Local import
+from pengbot99 import manager_registry
+from pengbot99 import schedule
+from pengbot99 import utils
+
+
+class TestManagerRegistry(unittest.TestCase):
+    """ Managers are built once, on first access.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        self.builds = []
+        self.registry = manager_registry.ManagerRegistry()
+        self.registry.register("slot2", self.build_slot2)
+        self.registry.register("wrapper", self.build_wrapper)
+
+    def build_slot2(self):
+        self.builds.append("slot2")
+        wdsched = schedule.load_schedule(self.env['CONFIG_PATH'], "slot2_schedule")
+        wesched = schedule.load_schedule(self.env['CONFIG_PATH'], "slot2_schedule_weekend")
+        return schedule.Slot2ScheduleManager(schedule.origin, wdsched, wesched)
+
+    def build_wrapper(self):
+        self.builds.append("wrapper")
+        return [self.registry.get("slot2")]
+
+    def test_lazy_build(self):
+        self.assertFalse(self.registry.is_built("slot2"))
+        mgr = self.registry.get("slot2")
+        self.assertTrue(self.registry.is_built("slot2"))
+        self.assertIs(self.registry.get("slot2"), mgr)
+        self.assertEqual(self.builds, ["slot2"])
+        self.assertEqual(list(self.registry.build_times), ["slot2"])
+
+    def test_nested_build(self):
+        wrapper = self.registry.get("wrapper")
+        self.assertIs(wrapper[0], self.registry.get("slot2"))
+        self.assertEqual(self.builds, ["wrapper", "slot2"])
+        # build times don't include the managers built along the way
+        times = self.registry.build_times
+        self.assertLess(times["wrapper"], times["slot2"])
+
+    def test_warm_up(self):
+        callbacks = []
+        self.registry.add_build_callback(callbacks.append)
+        thread = threading.Thread(target=self.registry.warm_up, args=(["slot2", "unknown"],))
+        thread.start()
+        mgr = self.registry.get("slot2")
+        thread.join()
+        self.assertIs(self.registry.get("slot2"), mgr)
+        self.assertEqual(self.builds, ["slot2"])
+        self.assertEqual(callbacks, ["slot2"])
+        self.registry.warm_up()
+        self.assertEqual(self.builds, ["slot2", "wrapper"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -99,5 +99,127 @@ class TestMiniprixManagerMiniWorldTourClassic(unittest.TestCase):
         self.assertEqual(evts[0].start_time, datetime(2025, 5, 5, 5, 0, 0, 0, tzinfo=timezone.utc))
 
 
+class TestLineupRing(unittest.TestCase):
+    """ The ring pairs each lineup with the mirroring row that follows it
+        in schedule order, across wrap-arounds of both schedules.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        self.mpsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'miniprix_schedule')
+        self.mirrorsc = schedule.load_schedule(self.env['CONFIG_PATH'], 'miniprix_mirroring_schedule')
+
+    def test_merged_rows(self):
+        rows, mirror_rows = self.mpsched[:-1], self.mirrorsc[:-1]
+        ring = miniprix.LineupRing(self.mpsched, self.mirrorsc, 24, 6)
+        self.assertEqual(len(ring) % len(rows), 0)
+        self.assertEqual(len(ring) % len(mirror_rows), 0)
+        # the window for the 30th cycle of 10 Mini-Prix
+        first = 30 * 10 - 24
+        for idx, entry in enumerate(ring.iter_window(first, 10)):
+            row = rows[(first + idx) % len(rows)]
+            mirror_row = mirror_rows[(30 * 10 - 6 + idx) % len(mirror_rows)]
+            mpid = "{:03d}.{:d}".format(row[0], mirror_row[0])
+            self.assertEqual(entry, (mpid, tuple(row[1].split(' > ')), mirror_row[1]))
+
+    def test_no_mirror(self):
+        ring = miniprix.LineupRing(self.mpsched)
+        self.assertEqual(len(ring), len(self.mpsched) - 1)
+        entries = list(ring.iter_window(len(ring) - 1, 2))
+        self.assertEqual([entry[0] for entry in entries], ["048.0", "001.0"])
+        self.assertEqual(entries[0][2], "000")
+
+
+class TestPrivateMPManager(unittest.TestCase):
+    """ Private lobby lineups are sliced from a table covering the day
+        ahead, with public Mini-Prix lineups merged in.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        self.origin = datetime(2024, 2, 6, 0, 0, 0, 0, tzinfo=timezone.utc)
+        wdsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule')
+        wesched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule_weekend')
+        mpsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'miniprix_schedule')
+        mirrorsc = schedule.load_schedule(self.env['CONFIG_PATH'], 'miniprix_mirroring_schedule')
+        plmpsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'private_miniprix_schedule')
+        slot2mgr = schedule.Slot2ScheduleManager(self.origin, wdsched, wesched)
+        self.mp_mgr = miniprix.MiniPrixManager("miniprix", slot2mgr, mpsched, mirrorsc, 24, 6, mp_cycles=10)
+        pl_slot1 = schedule.Slot1ScheduleManager(self.origin + timedelta(minutes=17), plmpsched)
+        mirror_slot1 = schedule.Slot1ScheduleManager(self.origin, mirrorsc)
+        self.mgr = miniprix.PrivateMPManager("miniprix", pl_slot1, self.mp_mgr, mirror_slot1)
+
+    def test_public_override(self):
+        start = datetime(2024, 8, 24, 0, 25, 0, 0, tzinfo=timezone.utc)
+        evts = self.mgr.eventify_lineups(start, self.mgr._build_lineups(start, 11))
+        public = self.mp_mgr.get_miniprix(start)
+        self.assertEqual(public[0].start_time, datetime(2024, 8, 24, 0, 30, 0, 0, tzinfo=timezone.utc))
+        self.assertEqual([evt.name for evt in evts[5:]], [evt.name for evt in public[:6]])
+        self.assertNotIn(evts[4].name, [evt.name for evt in public])
+
+    def test_table(self):
+        now = datetime(2024, 8, 23, 21, 0, 0, 0, tzinfo=timezone.utc)
+        table_start, table = self.mgr._update_table(now)
+        self.assertEqual(len(table), miniprix.PMP_TABLE_MINUTES)
+        for minutes in (0, 59, 300, 1000):
+            now += timedelta(minutes=minutes)
+            start = now + timedelta(minutes=minutes % 13)
+            lineups = self.mgr._get_lineups(start, 11, now)
+            self.assertEqual(lineups, self.mgr._build_lineups(start, 11))
+            # the table still covers most of the day ahead
+            table_start, table = self.mgr._table
+            table_end = table_start + timedelta(minutes=len(table))
+            ahead = miniprix.PMP_TABLE_MINUTES - miniprix.PMP_TABLE_STEP
+            self.assertGreater(table_end, now + timedelta(minutes=ahead))
+
+
+class TestTrackSearch(unittest.TestCase):
+    """ Races on a track, found from the track index, are the ones listed
+        by going through every Mini-Prix.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        self.origin = datetime(2024, 2, 6, 0, 0, 0, 0, tzinfo=timezone.utc)
+        wdsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule')
+        wesched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule_weekend')
+        mpsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'miniprix_schedule')
+        mirrorsc = schedule.load_schedule(self.env['CONFIG_PATH'], 'miniprix_mirroring_schedule')
+        plmpsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'private_miniprix_schedule')
+        self.slot2mgr = schedule.Slot2ScheduleManager(self.origin, wdsched, wesched)
+        self.mp_mgr = miniprix.MiniPrixManager("miniprix", self.slot2mgr, mpsched, mirrorsc, 24, 6, mp_cycles=10)
+        pl_slot1 = schedule.Slot1ScheduleManager(self.origin + timedelta(minutes=17), plmpsched)
+        mirror_slot1 = schedule.Slot1ScheduleManager(self.origin, mirrorsc)
+        self.pmp_mgr = miniprix.PrivateMPManager("miniprix", pl_slot1, self.mp_mgr, mirror_slot1)
+
+    def list_races(self, evts, track, mirrored):
+        races = []
+        for evt in evts:
+            flags = [race.startswith('m') for race in evt.races if race.lstrip('m') == track]
+            if flags and (mirrored is None or mirrored in flags):
+                races.append((evt.start_time, evt.name))
+        return races
+
+    def test_public(self):
+        start = datetime(2024, 8, 21, 10, 3, 30, tzinfo=timezone.utc)
+        until = start + timedelta(weeks=2)
+        evts = []
+        timestamp = start
+        while timestamp <= until:
+            lineups = self.mp_mgr.get_miniprix(timestamp)
+            evts.extend(evt for evt in lineups if start.replace(second=0) <= evt.start_time <= until)
+            timestamp = lineups[-1].end_time
+        for track in ("Mystery_4", "Big_Blue", "Silence"):
+            for mirrored in (None, True, False):
+                found = self.list_races(self.mp_mgr.iter_track(track, start, until, mirrored), track, None)
+                self.assertEqual(found, self.list_races(evts, track, mirrored), (track, mirrored))
+
+    def test_private(self):
+        start = datetime(2024, 8, 23, 21, 0, 0, 0, tzinfo=timezone.utc)
+        until = start + timedelta(hours=6)
+        evts = self.pmp_mgr.eventify_lineups(start, self.pmp_mgr._build_lineups(start, 6 * 60 + 1))
+        for track in ("Mystery_4", "Port_Town_II"):
+            for mirrored in (None, True):
+                found = self.list_races(self.pmp_mgr.iter_track(track, start, until, mirrored), track, None)
+                self.assertEqual(found, self.list_races(evts, track, mirrored), (track, mirrored))
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
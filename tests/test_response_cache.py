@@ -0,0 +1,132 @@
+# Python imports
+from datetime import datetime, timedelta, timezone
+import unittest
+
+# Local import
+from pengbot99 import events
+from pengbot99 import formatters
+from pengbot99 import response_cache
+from pengbot99 import schedule
+from pengbot99 import utils
+
+
+class TestResponseCache(unittest.TestCase):
+    """ Responses are kept until their expiry time, least recently used
+        ones are dropped when the cache is full.
+    """
+    def setUp(self):
+        self.now = datetime(2024, 8, 24, 0, 25, 30, tzinfo=timezone.utc)
+        self.calls = []
+        self.cache = response_cache.ResponseCache(size=2)
+
+    def compute(self, value, minutes):
+        def compute_fn():
+            self.calls.append(value)
+            if minutes is None:
+                return value, None
+            return value, self.now + timedelta(minutes=minutes)
+        return compute_fn
+
+    def test_expiry(self):
+        cache = self.cache
+        self.assertEqual(cache.get("when", ("King League",), self.compute("a", 5), self.now), "a")
+        later = self.now + timedelta(minutes=4)
+        self.assertEqual(cache.get("when", ("King League",), self.compute("b", 5), later), "a")
+        later = self.now + timedelta(minutes=5)
+        self.assertEqual(cache.get("when", ("King League",), self.compute("c", 5), later), "c")
+        self.assertEqual(self.calls, ["a", "c"])
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_not_kept(self):
+        self.cache.get("when", (), self.compute("a", None), self.now)
+        self.cache.get("when", (), self.compute("b", 0), self.now)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru(self):
+        cache = self.cache
+        cache.get("when", (1,), self.compute("a", 5), self.now)
+        cache.get("when", (2,), self.compute("b", 5), self.now)
+        # 1 is used again, so 2 is dropped for 3
+        cache.get("when", (1,), self.compute("x", 5), self.now)
+        cache.get("when", (3,), self.compute("c", 5), self.now)
+        self.assertEqual(cache.get("when", (1,), self.compute("x", 5), self.now), "a")
+        self.assertEqual(cache.get("when", (2,), self.compute("y", 5), self.now), "y")
+        self.assertEqual(len(cache), 2)
+
+
+class TestTimestampChange(unittest.TestCase):
+    """ Long timestamps switch to short ones 20 hours before the event.
+    """
+    def test_change(self):
+        now = datetime(2024, 8, 24, 0, 25, 30, tzinfo=timezone.utc)
+        start = now + timedelta(days=2)
+        self.assertEqual(formatters.get_timestamp_change(start, now), start - timedelta(hours=20))
+        start = now + timedelta(hours=2)
+        self.assertEqual(formatters.get_timestamp_change(start, now), start + timedelta(hours=20))
+        start = now - timedelta(days=2)
+        self.assertIsNone(formatters.get_timestamp_change(start, now))
+
+
+class TestListBoundary(unittest.TestCase):
+    """ Event lists are kept until the ongoing event ends, or the next
+        event comes within reach, whichever happens first.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        self.now = datetime(2024, 8, 24, 0, 25, 30, tzinfo=timezone.utc)
+
+    def make_event(self, name, start, minutes):
+        return events.Event(name, start_minute=0, end_minute=minutes, start_time=start)
+
+    def test_ongoing_ends(self):
+        ongoing = self.make_event("king", self.now - timedelta(minutes=10), 15)
+        last = self.make_event("queen", self.now + timedelta(minutes=55), 60)
+        boundary = response_cache.get_list_boundary([ongoing, last], 80)
+        self.assertEqual(boundary, ongoing.end_time)
+
+    def test_next_within_reach(self):
+        ongoing = self.make_event("king", self.now - timedelta(minutes=10), 60)
+        last = self.make_event("queen", self.now + timedelta(minutes=55), 30)
+        boundary = response_cache.get_list_boundary([ongoing, last], 80)
+        self.assertEqual(boundary, last.end_time - timedelta(minutes=80))
+
+    def test_empty(self):
+        self.assertIsNone(response_cache.get_list_boundary([], 80))
+
+    def test_after_now(self):
+        wdsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule')
+        wesched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule_weekend')
+        mgr = schedule.Slot2ScheduleManager(schedule.origin, wdsched, wesched)
+        for minute in range(0, 3 * 24 * 60, 7):
+            now = self.now + timedelta(minutes=minute)
+            for minutes in (80, 119):
+                evts = mgr.list_events(timestamp=now, next=minutes)
+                self.assertGreater(response_cache.get_list_boundary(evts, minutes), now)
+
+
+class TestExpiry(unittest.TestCase):
+    """ Responses expire at their boundary, or when one of their timestamps
+        is displayed differently.
+    """
+    def setUp(self):
+        self.now = datetime(2024, 8, 24, 0, 25, 30, tzinfo=timezone.utc)
+
+    def test_boundary(self):
+        boundary = self.now + timedelta(minutes=5)
+        times = [self.now + timedelta(hours=1)]
+        self.assertEqual(response_cache.get_expiry(boundary, times, self.now), boundary)
+
+    def test_timestamp_change(self):
+        boundary = self.now + timedelta(days=3)
+        start = self.now + timedelta(days=2)
+        expires = response_cache.get_expiry(boundary, [start], self.now)
+        self.assertEqual(expires, start - timedelta(hours=20))
+
+    def test_no_boundary(self):
+        self.assertEqual(response_cache.get_expiry(None, [], self.now), response_cache.NEVER)
+        start = self.now - timedelta(days=2)
+        self.assertEqual(response_cache.get_expiry(None, [start], self.now), response_cache.NEVER)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,14 @@
 # Python imports
 from datetime import datetime, timedelta, timezone
+import itertools
 import unittest
+from unittest import mock
 
 # Local import
+from pengbot99 import events
 from pengbot99 import utils
 from pengbot99 import schedule
+from pengbot99 import secret_league
 
 
 class TestSchedule(unittest.TestCase):
@@ -260,5 +264,382 @@ class Test_Yet_Another_Rotation_EdgeCase(unittest.TestCase):
         self.assertEqual(result, expected)
 
 
+class TestTimeTable(unittest.TestCase):
+    """ Row lookups go through the per-minute index built at construction.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        wdsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule')
+        self.tt = schedule.TimeTable(wdsched, "weekday")
+
+    def test_active_row(self):
+        self.assertEqual(self.tt._get_active_row(0)[0], 0)
+        self.assertEqual(self.tt._get_active_row(29)[0], 10)
+        self.assertEqual(self.tt._get_active_row(30)[0], 30)
+        self.assertEqual(self.tt._get_active_row(59)[0], 40)
+
+    def test_next_row(self):
+        self.assertEqual(self.tt._get_next_row(0)[0], 10)
+        self.assertEqual(self.tt._get_next_row(39)[0], 40)
+        self.assertEqual(self.tt._get_next_row(59)[1], "next")
+        self.assertEqual(self.tt._get_next_row(60), [])
+
+    def test_get_rotations_until(self):
+        rotations = self.tt.get_rotations_until(30)
+        self.assertEqual(len(rotations), 2)
+        self.assertEqual(rotations[-1], ("teambattle",))
+
+    def test_get_rotations_before(self):
+        rotations = self.tt.get_rotations_before(30)
+        self.assertEqual(rotations[("teambattle",)], 1)
+        self.assertNotIn(("miniprix", "classicprix"), rotations)
+        rotations = self.tt.get_rotations_before(31)
+        self.assertEqual(rotations[("miniprix", "classicprix")], 1)
+
+    def test_rotation_ids(self):
+        """ Rotations and names are interned when loaded.
+        """
+        wdsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule')
+        tt = schedule.TimeTable(wdsched, "weekday")
+        self.assertEqual(tt._rot_ids, self.tt._rot_ids)
+        self.assertEqual(schedule.rotation_ids[tt._rot_ids[1]], ("teambattle",))
+        self.assertIs(wdsched[1][1], self.tt._data[1][1])
+        rotations = tt.get_rotation_ids_before(31)
+        self.assertEqual(rotations[schedule.rotation_ids.intern(("miniprix", "classicprix"))], 1)
+
+
+def _time_types_by_day_walk(origin, now):
+    """ Reference implementation for weekday/weekend minutes since origin,
+        walking over the days of the last partial week.
+    """
+    if now.date() != origin.date() and (origin.hour or origin.minute):
+        tmr = origin + timedelta(days=1)
+        day1 = datetime(tmr.year, tmr.month, tmr.day, tzinfo=timezone.utc)
+        day1mins = (day1 - origin).seconds // 60
+        wd_minutes, we_minutes = (day1mins, 0) if origin.weekday() < 5 else (0, day1mins)
+        origin = day1
+    else:
+        wd_minutes, we_minutes = 0, 0
+    delta = now - origin
+    weeks = delta.days // 7
+    week_days = weeks * 5
+    weekend_days = weeks * 2
+    days = [day % 7 for day in range(now.weekday() - delta.days % 7, now.weekday())]
+    for day in days:
+        if day < 5:
+            week_days += 1
+        else:
+            weekend_days += 1
+    wd_minutes += week_days * 24 * 60
+    we_minutes += weekend_days * 24 * 60
+    if now.weekday() < 5:
+        wd_minutes += delta.seconds // 60
+    else:
+        we_minutes += delta.seconds // 60
+    return (wd_minutes, we_minutes)
+
+
+class TestTimeTypesSinceOrigin(unittest.TestCase):
+    """ The closed-form weekday/weekend minute count must match a day by day
+        count over several years.
+    """
+    def check_origin(self, origin):
+        mgr = schedule.Slot2ScheduleManager(origin, [(0, "ace"), (60, "next")], [(0, "king"), (60, "next")])
+        ts = origin
+        step = timedelta(hours=7, minutes=13, seconds=29)
+        while ts < origin + timedelta(days=3 * 365):
+            self.assertEqual(mgr.time_types_since_origin(ts), _time_types_by_day_walk(origin, ts), ts)
+            ts += step
+
+    def test_origin_at_midnight(self):
+        self.check_origin(schedule.origin)
+
+    def test_origin_during_weekday(self):
+        self.check_origin(datetime(2024, 10, 2, 2, 0, tzinfo=timezone.utc))
+
+    def test_origin_during_weekend(self):
+        self.check_origin(datetime(2024, 10, 5, 13, 0, tzinfo=timezone.utc))
+
+
+class TestIterEvents(unittest.TestCase):
+    """ Events are streamed cycle after cycle, across weekday/weekend changes.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        self.origin = datetime(2024, 10, 2, 2, 0, 0, 0, tzinfo=timezone.utc)
+        wdsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule_anniversary')
+        wesched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule_weekend_anniversary')
+        self.mgr = schedule.Slot2ScheduleManager(self.origin, wdsched, wesched)
+
+    def test_iter_events_matches_remaining_events(self):
+        """ Chaining each cycle's remaining events gives the same result.
+        """
+        ts = datetime(2024, 10, 4, 22, 45, tzinfo=timezone.utc)
+        expected = []
+        cycle_start = ts
+        all = False
+        while len(expected) < 60:
+            for evt in self.mgr.get_remaining_events(cycle_start, all=all):
+                if evt.name == "next":
+                    cycle_start = evt.start_time
+                    all = True
+                else:
+                    expected.append((evt.name, evt.start_time, evt.rotation_offset))
+        evts = self.mgr.iter_events(ts)
+        result = [(evt.name, evt.start_time, evt.rotation_offset) for evt in itertools.islice(evts, 60)]
+        self.assertEqual(result, expected[:60])
+
+    def test_iter_events_until(self):
+        ts = datetime(2024, 10, 4, 22, 45, tzinfo=timezone.utc)
+        evts = list(self.mgr.iter_events(ts, names=["ace", "mking"], until=ts + timedelta(hours=2)))
+        self.assertEqual([evt.name for evt in evts], ["ace", "mking"])
+
+
+class TestEventIndex(unittest.TestCase):
+    """ when_event computes occurences from the event index.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        self.origin = datetime(2024, 10, 2, 2, 0, 0, 0, tzinfo=timezone.utc)
+        wdsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule_anniversary')
+        wesched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule_weekend_anniversary')
+        self.mgr = schedule.Slot2ScheduleManager(self.origin, wdsched, wesched)
+
+    def as_tuples(self, evts):
+        return [(evt.name, evt.start_time, evt.cycle, evt.rotation_offset) for evt in evts]
+
+    def test_index_matches_get_events(self):
+        ts = datetime(2024, 12, 6, 21, 17, tzinfo=timezone.utc)
+        for names in (["ace"], ["mking", "king"], ["classicprix"], ["teambattle"]):
+            expected = self.mgr.get_events(names=names, count=30, timestamp=ts, limit=100000)
+            result = self.mgr.when_event(names, count=30, timestamp=ts)
+            self.assertEqual(self.as_tuples(result), self.as_tuples(expected))
+
+    def test_no_horizon_limit(self):
+        ts = datetime(2024, 12, 6, 21, 17, tzinfo=timezone.utc)
+        evts = self.mgr.when_event(["king"], count=200, timestamp=ts)
+        self.assertEqual(len(evts), 200)
+        self.assertGreater(evts[-1].start_time, ts + timedelta(days=7))
+
+    def test_unknown_event(self):
+        self.assertEqual(self.mgr.when_event(["nothing"], count=1), [])
+
+    def test_before_index_start(self):
+        """ Falls back to listing events before the index frame.
+        """
+        evts = self.mgr.when_event(["ace"], count=3, timestamp=self.origin)
+        self.assertEqual(len(evts), 3)
+        self.assertLess(evts[0].start_time, self.mgr.get_event_index().start)
+
+
+class TestResolveWindow(unittest.TestCase):
+    """ resolve_window finds the ongoing or next event and its count, as
+        when_event and CycleInfo do.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        self.origin = datetime(2024, 2, 6, 0, 0, 0, 0, tzinfo=timezone.utc)
+        wdsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule')
+        wesched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule_weekend')
+        self.mgr = schedule.Slot2ScheduleManager(self.origin, wdsched, wesched)
+
+    def check_window(self, ts):
+        evt, count = self.mgr.resolve_window("miniprix", ts)
+        current = self.mgr.get_event(ts)
+        if current.name == "miniprix":
+            expected = current
+        else:
+            expected = self.mgr.when_event(["miniprix"], timestamp=ts)[0]
+        self.assertEqual(evt.start_time, expected.start_time, ts)
+        # events counted before the one found
+        info = self.mgr.get_cycle_info(expected.start_time)
+        self.assertEqual(count, info.get_event("miniprix"), ts)
+
+    def test_weekend(self):
+        # several Mini-Prix per cycle
+        start = datetime(2024, 8, 24, 0, 0, tzinfo=timezone.utc)
+        for minute in range(0, 300, 7):
+            self.check_window(start + timedelta(minutes=minute, seconds=30))
+
+    def test_weekday(self):
+        start = datetime(2024, 8, 21, 10, 0, tzinfo=timezone.utc)
+        for minute in range(0, 300, 7):
+            self.check_window(start + timedelta(minutes=minute))
+
+    def test_unknown_event(self):
+        self.assertIsNone(self.mgr.resolve_window("nothing", self.origin))
+
+
+class TestOccurenceTable(unittest.TestCase):
+    """ Event start times follow from their count, as iter_events lists
+        them.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        self.origin = datetime(2024, 2, 6, 0, 0, 0, 0, tzinfo=timezone.utc)
+        wdsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule')
+        wesched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule_weekend')
+        self.mgr = schedule.Slot2ScheduleManager(self.origin, wdsched, wesched)
+
+    def test_start_times(self):
+        table = self.mgr.get_occurence_table("miniprix")
+        self.assertIs(self.mgr.get_occurence_table("miniprix"), table)
+        start = datetime(2024, 8, 21, 10, 0, tzinfo=timezone.utc)
+        evt, count = self.mgr.resolve_window("miniprix", start)
+        self.assertTrue(table.covers(count))
+        until = start + timedelta(weeks=3)
+        for evt in self.mgr.iter_events(start - timedelta(minutes=1), ["miniprix"], until):
+            self.assertEqual(table.get_event_times(count), (evt.start_time, evt.duration))
+            count += 1
+
+    def test_unknown_event(self):
+        table = self.mgr.get_occurence_table("nothing")
+        self.assertEqual(len(table), 0)
+        self.assertFalse(table.covers(0))
+
+
+class TestGetEventsAt(unittest.TestCase):
+    """ Batch evaluation matches get_event at every timestamp.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        self.origin = datetime(2024, 10, 2, 2, 0, 0, 0, tzinfo=timezone.utc)
+        wdsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule_anniversary')
+        wesched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule_weekend_anniversary')
+        self.slot2mgr = schedule.Slot2ScheduleManager(self.origin, wdsched, wesched)
+        mpsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'miniprix_mirroring_schedule')
+        self.slot1mgr = schedule.Slot1ScheduleManager(self.origin, mpsched)
+        start = datetime(2024, 10, 3, 21, 0, tzinfo=timezone.utc)
+        self.timestamps = [start + timedelta(minutes=7 * n) for n in range(1500)]
+
+    def check_manager(self, mgr):
+        codes, starts, offsets = mgr.get_events_at(self.timestamps)
+        for idx, ts in enumerate(self.timestamps):
+            evt = mgr.get_event(ts)
+            start = (evt.start_time - schedule.epoch) // timedelta(minutes=1)
+            result = (mgr.rotation_data.names[codes[idx]], int(starts[idx]), int(offsets[idx]))
+            self.assertEqual(result, (evt.name, start, evt.rotation_offset), ts)
+
+    def test_slot1(self):
+        self.check_manager(self.slot1mgr)
+
+    def test_slot2(self):
+        self.check_manager(self.slot2mgr)
+
+    def test_pure_python(self):
+        with mock.patch.object(schedule, "numpy", None):
+            self.check_manager(self.slot1mgr)
+            self.check_manager(self.slot2mgr)
+
+
+class TestTimeline(unittest.TestCase):
+    """ The timeline has the same events as iter_events, Secret League
+        included, well after its first period.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        self.origin = datetime(2024, 2, 6, 0, 0, 0, 0, tzinfo=timezone.utc)
+        wdsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule')
+        wesched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule_weekend')
+        secret_cfg = secret_league.SecretLeagueConfig("11,6,7,3,8,4", "30")
+        we_secret_cfg = secret_league.SecretLeagueConfig("22,12,14,6,16,8", "60")
+        self.mgr = schedule.Slot2ScheduleManager(self.origin, wdsched, wesched, secret_cfg, we_secret_cfg)
+
+    def check_timeline(self):
+        timeline = self.mgr.get_timeline()
+        self.assertEqual(timeline.nbytes, self.mgr.get_timeline_size())
+        ts = timeline.start + timedelta(minutes=timeline.minutes + 12345)
+        evts = self.mgr.iter_events(ts, until=ts + timedelta(days=9))
+        for evt in evts:
+            self.assertEqual(self.mgr.get_event_name(evt.start_time), evt.name, evt.start_time)
+            last_minute = evt.end_time - timedelta(minutes=1)
+            self.assertEqual(self.mgr.get_event_name(last_minute), evt.name, last_minute)
+
+    def test_period(self):
+        start, minutes = self.mgr.get_timeline_period()
+        self.assertEqual(start.weekday(), 0)
+        # 39 and 78 GP Secret League patterns, 6 GP rotation
+        self.assertEqual(minutes, 13 * schedule.WEEK_MINUTES)
+
+    def test_timeline(self):
+        self.check_timeline()
+
+    def test_pure_python(self):
+        with mock.patch.object(schedule, "numpy", None):
+            self.check_timeline()
+
+
+class TestWhenSecretLeague(unittest.TestCase):
+    """ Secret League events computed from the rotation counter are the
+        glitched Grand Prix, weekday and weekend configs included.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        self.origin = datetime(2024, 2, 6, 0, 0, 0, 0, tzinfo=timezone.utc)
+        wdsched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule')
+        wesched = schedule.load_schedule(self.env['CONFIG_PATH'], 'slot2_schedule_weekend')
+        secret_cfg = secret_league.SecretLeagueConfig("11,6,7,3,8,4", "30")
+        we_secret_cfg = secret_league.SecretLeagueConfig("22,12,14,6,16,8", "60")
+        self.mgr = schedule.Slot2ScheduleManager(self.origin, wdsched, wesched, secret_cfg, we_secret_cfg)
+
+    def as_tuples(self, evts):
+        return [(evt.name, evt.start_time, evt.cycle, evt.glitch) for evt in evts]
+
+    def check_glitches(self, ts, count):
+        result = self.mgr.when_secret_league(count=count, timestamp=ts)
+        gps = self.mgr.iter_events(ts, secret_league.GP_NAMES)
+        expected = []
+        for evt in gps:
+            if evt.glitch:
+                expected.append(evt)
+                if len(expected) == count:
+                    break
+        self.assertEqual(self.as_tuples(result), self.as_tuples(expected))
+
+    def test_weekday(self):
+        self.check_glitches(datetime(2024, 12, 4, 21, 17, tzinfo=timezone.utc), 12)
+
+    def test_weekend(self):
+        # spans the weekend into the next week
+        self.check_glitches(datetime(2024, 12, 7, 3, 0, tzinfo=timezone.utc), 40)
+
+    def test_before_index_start(self):
+        self.check_glitches(self.origin, 5)
+        self.assertLess(self.origin, self.mgr.get_event_index().start)
+
+    def test_off(self):
+        self.mgr._secret_cfg = None
+        self.assertEqual(self.mgr.when_secret_league(count=3), [])
+
+
+class TestSecretLeagueConfig(unittest.TestCase):
+    """ Grand Prix glitch when their cycle falls on the config indices.
+    """
+    def setUp(self):
+        self.cfg = secret_league.SecretLeagueConfig("11,6,7,3,8,4", "30")
+        self.start = datetime(2024, 12, 4, 21, 0, tzinfo=timezone.utc)
+
+    def create_event(self, name, cycle):
+        return events.Event(name, cycle=cycle, start_minute=0, end_minute=10, start_time=self.start)
+
+    def test_glitch_table(self):
+        indices = [idx for idx, glitch in enumerate(self.cfg.glitch_table) if glitch]
+        self.assertEqual(indices, self.cfg.indices)
+
+    def test_can_glitch(self):
+        glitch_cycle = self.cfg.length * 3 + self.cfg.indices[0]
+        self.assertTrue(self.cfg.can_glitch(self.create_event("king", glitch_cycle)))
+        self.assertFalse(self.cfg.can_glitch(self.create_event("king", glitch_cycle + 1)))
+        self.assertFalse(self.cfg.can_glitch(self.create_event("classicprix", glitch_cycle)))
+
+    def test_can_glitch_ongoing(self):
+        """ Past its first minute, an ongoing event's cycle was already counted.
+        """
+        evt = self.create_event("king", self.cfg.indices[0] + 1)
+        now = self.start + timedelta(minutes=5)
+        self.assertTrue(self.cfg.can_glitch(evt, ongoing=True, now=now))
+        self.assertFalse(self.cfg.can_glitch(evt, ongoing=True, now=self.start))
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,74 @@
+# Python imports
+import os
+import shutil
+import tempfile
+import unittest
+
+# Local import
+from pengbot99 import utils
+from pengbot99 import schedule
+from pengbot99 import schedule_cache
+
+
+class TestScheduleCache(unittest.TestCase):
+    """ Schedules are read from the cache until their CSV file changes.
+    """
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        self.folder = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.folder.name, "config")
+        os.mkdir(self.config_path)
+        for name in ("slot2_schedule", "slot2_schedule_weekend"):
+            csv_name = "{0}.csv".format(name)
+            shutil.copy(os.path.join(self.env['CONFIG_PATH'], csv_name), self.config_path)
+        self.cache_path = os.path.join(self.folder.name, "cache")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def create_cache(self):
+        return schedule_cache.ScheduleCache(self.config_path, self.cache_path)
+
+    def test_load_schedule(self):
+        cache = self.create_cache()
+        rows = cache.load_schedule("slot2_schedule")
+        self.assertEqual(rows, schedule.load_schedule(self.config_path, "slot2_schedule"))
+        cache.save()
+        cache = self.create_cache()
+        self.assertEqual(cache.load_schedule("slot2_schedule"), rows)
+        self.assertFalse(cache.dirty)
+
+    def test_touched_file(self):
+        """ A file with a new mtime but the same content stays cached.
+        """
+        cache = self.create_cache()
+        cache.load_schedule("slot2_schedule")
+        cache.save()
+        csv_path = os.path.join(self.config_path, "slot2_schedule.csv")
+        stat = os.stat(csv_path)
+        os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        cache = self.create_cache()
+        cache.load_schedule("slot2_schedule")
+        self.assertTrue(cache._is_fresh("slot2_schedule"))
+
+    def test_changed_file(self):
+        cache = self.create_cache()
+        cache.load_schedule("slot2_schedule")
+        cache.get_value("duration", ["slot2_schedule"], lambda: 60)
+        cache.save()
+        with open(os.path.join(self.config_path, "slot2_schedule.csv"), "w") as fd:
+            fd.write("0,king\n90,next\n")
+        cache = self.create_cache()
+        self.assertEqual(cache.load_schedule("slot2_schedule"), [(0, "king"), (90, "next")])
+        self.assertEqual(cache.get_value("duration", ["slot2_schedule"], lambda: 90), 90)
+
+    def test_cached_value(self):
+        cache = self.create_cache()
+        cache.get_value("duration", ["slot2_schedule_weekend"], lambda: 120)
+        cache.save()
+        cache = self.create_cache()
+        self.assertEqual(cache.get_value("duration", ["slot2_schedule_weekend"], lambda: 0), 120)
+
+
+if __name__ == "__main__":
+    unittest.main()
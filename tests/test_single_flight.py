@@ -0,0 +1,75 @@
+# Python imports
+import asyncio
+import threading
+import unittest
+
+# Local import
+from pengbot99 import single_flight
+
+
+class TestSingleFlight(unittest.TestCase):
+    """ Identical queries made while one is running share its result.
+    """
+    def setUp(self):
+        self.flights = single_flight.SingleFlight()
+        self.calls = []
+        self.release = threading.Event()
+
+    def compute(self, value):
+        def compute_fn():
+            self.calls.append(value)
+            self.release.wait(5)
+            return value
+        return compute_fn
+
+    async def run_burst(self):
+        tasks = [asyncio.ensure_future(self.flights.run("when", ("King League", 5), self.compute(idx)))
+                 for idx in range(5)]
+        tasks.append(asyncio.ensure_future(self.flights.run("when", ("Ace League", 5), self.compute(9))))
+        # let every call register before the queries complete
+        await asyncio.sleep(0)
+        self.release.set()
+        return await asyncio.gather(*tasks)
+
+    def test_coalesce(self):
+        results = asyncio.run(self.run_burst())
+        self.assertEqual(results, [0, 0, 0, 0, 0, 9])
+        self.assertEqual(sorted(self.calls), [0, 9])
+        self.assertEqual(self.flights.counts, {"when": [6, 4]})
+        self.assertEqual(self.flights.get_totals(), (6, 4))
+
+    def test_sequential(self):
+        self.release.set()
+        async def run_twice():
+            first = await self.flights.run("when", (), self.compute(1))
+            second = await self.flights.run("when", (), self.compute(2))
+            return first, second
+        self.assertEqual(asyncio.run(run_twice()), (1, 2))
+        self.assertEqual(self.flights.get_totals(), (2, 0))
+
+    def test_error(self):
+        def fail():
+            raise ValueError("no schedule")
+        async def run_failing():
+            tasks = [self.flights.run("when", (), fail) for idx in range(2)]
+            return await asyncio.gather(*tasks, return_exceptions=True)
+        results = asyncio.run(run_failing())
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(self.flights.get_totals(), (2, 1))
+
+    def test_workers(self):
+        flights = single_flight.SingleFlight(max_workers=2)
+        started = threading.Barrier(2, timeout=5)
+        def compute_fn():
+            # only completes if both queries run at once
+            started.wait()
+            return threading.current_thread().name
+        async def run_both():
+            tasks = [flights.run("when", (idx,), compute_fn) for idx in range(2)]
+            return await asyncio.gather(*tasks)
+        names = asyncio.run(run_both())
+        self.assertEqual(len(set(names)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
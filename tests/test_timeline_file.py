@@ -0,0 +1,63 @@
+# Python imports
+from datetime import datetime, timedelta, timezone
+import os
+import tempfile
+import unittest
+
+# Local import
+from pengbot99 import utils
+from pengbot99 import schedule
+from pengbot99 import timeline_file
+
+
+class TestTimelineFile(unittest.TestCase):
+    """ Timelines written to a file are read back from shared memory.
+    """
+    def create_managers(self):
+        origin = datetime(2024, 2, 6, 0, 0, 0, 0, tzinfo=timezone.utc)
+        config = self.env['CONFIG_PATH']
+        wdsched = schedule.load_schedule(config, 'slot2_schedule')
+        wesched = schedule.load_schedule(config, 'slot2_schedule_weekend')
+        mirrorsc = schedule.load_schedule(config, 'miniprix_mirroring_schedule')
+        return {
+                "slot2": schedule.Slot2ScheduleManager(origin, wdsched, wesched),
+                "mirror": schedule.Slot1ScheduleManager(origin, mirrorsc),
+            }
+
+    def setUp(self):
+        self.env = utils.load_env("fixtures/.env")
+        self.folder = tempfile.TemporaryDirectory()
+        self.key = timeline_file.config_key(self.env['CONFIG_PATH'])
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_share_timelines(self):
+        writer = self.create_managers()
+        timeline_file.share_timelines(self.folder.name, self.key, writer)
+        path = timeline_file.get_path(self.folder.name, self.key)
+        mtime = os.stat(path).st_mtime_ns
+        reader = self.create_managers()
+        tl_file = timeline_file.share_timelines(self.folder.name, self.key, reader)
+        # the file was mapped, not written again
+        self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+        self.assertEqual(tl_file.path, path)
+        self.assertEqual(tl_file.key, self.key)
+        for name, mgr in reader.items():
+            timeline = mgr.get_timeline()
+            self.assertIsInstance(timeline.codes, memoryview)
+            expected = writer[name].get_timeline().codes
+            self.assertEqual(timeline.codes.tolist(), expected.tolist())
+            ts = timeline.start + timedelta(days=200, minutes=13)
+            self.assertEqual(mgr.get_event_name(ts), mgr.get_event(ts).name)
+
+    def test_other_config(self):
+        folder = self.folder.name
+        timeline_file.share_timelines(folder, self.key, self.create_managers())
+        other_key = "0" * len(self.key)
+        timeline_file.share_timelines(folder, other_key, self.create_managers())
+        self.assertEqual(len(os.listdir(self.folder.name)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()